@@ -0,0 +1,327 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections import Counter
+
+from post_ids import post_id_from_url
+from post_store import POST_FIELDS, PostStore, post_attributes
+
+
+# reddit_corpus.pack layout, all little endian:
+#   header   magic, version, post count, then the offset and size of each
+#            section below
+#   dict     zlib preset dictionary shared by every frame
+#   frames   one zlib frame per post: the full post as compact json
+#   strings  url, title and thread name of every post, utf-8, uncompressed
+#   records  one fixed size RECORD per post: where its frame and strings
+#            are, plus the eligibility attributes (see post_store.py)
+# Selection only reads records and strings straight out of the mmap;
+# a frame is decompressed when that one post is actually loaded.
+MAGIC = b"RSPK"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxI8Q")
+RECORD = struct.Struct("<QIQHHHiiiiB")
+
+# frames are single posts, too small for zlib to find much to reuse on
+# its own; a dictionary of the commonest corpus text makes up for it
+DICT_SIZE = 32 * 1024
+DICT_SAMPLE_POSTS = 2000
+
+
+def _length(value):
+    return -1 if value is None else value
+
+
+def _from_length(value):
+    return None if value == -1 else value
+
+
+def build_dictionary(post_dicts):
+    """
+    zlib preset dictionary from a sample of posts: their json keys and
+    commonest words, most frequent last since zlib reaches back from the
+    end of the dictionary most cheaply.
+    """
+    words = Counter()
+    for data in post_dicts[:DICT_SAMPLE_POSTS]:
+        words.update(json.dumps(data, separators=(",", ":")).split(" "))
+    dictionary = b""
+    for word, count in reversed(words.most_common()):
+        if count < 2:
+            continue
+        dictionary += word.encode("utf-8") + b" "
+    return dictionary[-DICT_SIZE:]
+
+
+def write_pack(post_dicts, pack_path):
+    """Write post_dicts into a new pack at pack_path, replacing it atomically."""
+    post_dicts = list(post_dicts)
+    dictionary = build_dictionary(post_dicts)
+    temp_path = f"{pack_path}.tmp"
+
+    records, strings = [], bytearray()
+    with open(temp_path, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        dict_offset = f.tell()
+        f.write(dictionary)
+
+        frames_offset = f.tell()
+        for data in post_dicts:
+            compressor = zlib.compressobj(9, zdict=dictionary)
+            frame = compressor.compress(
+                json.dumps({k: data.get(k) for k in POST_FIELDS}, separators=(",", ":"))
+                .encode("utf-8")
+            )
+            frame += compressor.flush()
+
+            url = (data.get("url") or "").encode("utf-8")
+            title = (data.get("title") or "").encode("utf-8")
+            thread = (data.get("thread_name") or "").encode("utf-8")
+            attributes = post_attributes(data)
+            records.append(
+                RECORD.pack(
+                    f.tell() - frames_offset,
+                    len(frame),
+                    len(strings),
+                    len(url),
+                    len(title),
+                    len(thread),
+                    _length(attributes["content_len"]),
+                    _length(attributes["title_len"]),
+                    _length(attributes["thread_len"]),
+                    _length(attributes["username_len"]),
+                    attributes["complete"],
+                )
+            )
+            strings += url + title + thread
+            f.write(frame)
+        frames_size = f.tell() - frames_offset
+
+        strings_offset = f.tell()
+        f.write(strings)
+        records_offset = f.tell()
+        f.write(b"".join(records))
+
+        f.seek(0)
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                len(records),
+                dict_offset,
+                len(dictionary),
+                frames_offset,
+                frames_size,
+                strings_offset,
+                len(strings),
+                records_offset,
+                len(records) * RECORD.size,
+            )
+        )
+    os.replace(temp_path, pack_path)
+    return len(records)
+
+
+class CorpusPack:
+    """
+    Read-only view of a pack written by write_pack, memory mapped so
+    lookups slice the file in place instead of reading it into memory.
+    """
+
+    def __init__(self, pack_path="reddit_corpus.pack"):
+        self.pack_path = pack_path
+        self.file = open(pack_path, "rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+
+        (
+            magic,
+            version,
+            self.post_count,
+            dict_offset,
+            dict_size,
+            self.frames_offset,
+            _,
+            self.strings_offset,
+            _,
+            self.records_offset,
+            _,
+        ) = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{pack_path} is not a version {VERSION} corpus pack")
+        self.dictionary = bytes(self.view[dict_offset : dict_offset + dict_size])
+        self._url_index = None
+
+    def __len__(self):
+        return self.post_count
+
+    def _record(self, i):
+        return RECORD.unpack_from(self.mmap, self.records_offset + i * RECORD.size)
+
+    def _strings(self, i):
+        record = self._record(i)
+        start = self.strings_offset + record[2]
+        url_end = start + record[3]
+        title_end = url_end + record[4]
+        thread_end = title_end + record[5]
+        return (
+            str(self.view[start:url_end], "utf-8"),
+            str(self.view[url_end:title_end], "utf-8"),
+            str(self.view[title_end:thread_end], "utf-8"),
+        )
+
+    def url(self, i):
+        return self._strings(i)[0]
+
+    def title(self, i):
+        return self._strings(i)[1]
+
+    def attributes(self, i):
+        record = self._record(i)
+        return {
+            "content_len": _from_length(record[6]),
+            "title_len": _from_length(record[7]),
+            "thread_len": _from_length(record[8]),
+            "username_len": _from_length(record[9]),
+            "complete": record[10],
+        }
+
+    def get_post(self, i):
+        """Decompress one post's frame back into its dict."""
+        record = self._record(i)
+        start = self.frames_offset + record[0]
+        decompressor = zlib.decompressobj(zdict=self.dictionary)
+        raw = decompressor.decompress(self.view[start : start + record[1]])
+        return json.loads(raw)
+
+    def find(self, url):
+        """Index of the post with url (matched on post id), or None."""
+        if self._url_index is None:
+            self._url_index = {}
+            for i in range(self.post_count):
+                url_i = self.url(i)
+                self._url_index[post_id_from_url(url_i) or url_i] = i
+        return self._url_index.get(post_id_from_url(url) or url)
+
+    def post_ids(self):
+        ids = (post_id_from_url(self.url(i)) for i in range(self.post_count))
+        return [post_id for post_id in ids if post_id is not None]
+
+    def query(
+        self,
+        min_content_len=None,
+        max_content_len=None,
+        max_thread_len=None,
+        max_username_len=None,
+    ):
+        """
+        Indexes of every complete post matching the eligibility criteria,
+        read from the records alone.
+        """
+        matches = []
+        for i in range(self.post_count):
+            record = self._record(i)
+            content_len, thread_len, username_len = record[6], record[8], record[9]
+            if not record[10]:
+                continue
+            if min_content_len is not None and content_len < min_content_len:
+                continue
+            if max_content_len is not None and content_len > max_content_len:
+                continue
+            if max_thread_len is not None and thread_len > max_thread_len:
+                continue
+            if max_username_len is not None and username_len > max_username_len:
+                continue
+            matches.append(i)
+        return matches
+
+    def iter_posts(self):
+        for i in range(self.post_count):
+            yield self.get_post(i)
+
+    def close(self):
+        self.view.release()
+        self.mmap.close()
+        self.file.close()
+
+
+def iter_source_posts(backend="folder", root="."):
+    if backend == "sqlite":
+        store = PostStore(os.path.join(root, "reddit_corpus.sqlite"))
+        yield from store.iter_posts()
+        store.close()
+        return
+
+    data_folder_path = os.path.join(root, "reddit_data")
+    for file_name in sorted(os.listdir(data_folder_path)):
+        if not file_name.endswith(".json"):
+            continue
+        file_path = os.path.join(data_folder_path, file_name)
+        try:
+            with open(file_path, "r") as f:
+                yield json.load(f)
+        except Exception as e:
+            print(f"[!] Skipping unreadable post file {file_path}: {e}")
+
+
+def source_size(backend="folder", root="."):
+    if backend == "sqlite":
+        return os.path.getsize(os.path.join(root, "reddit_corpus.sqlite"))
+    data_folder_path = os.path.join(root, "reddit_data")
+    return sum(
+        os.path.getsize(os.path.join(data_folder_path, f))
+        for f in os.listdir(data_folder_path)
+        if f.endswith(".json")
+    )
+
+
+def compact(backend="folder", root=".", pack_path=None):
+    """Pack the whole corpus of a DataSaver backend into one archive."""
+    pack_path = pack_path or os.path.join(root, "reddit_corpus.pack")
+    print(f"Packing the {backend} corpus in {root} into {pack_path}...")
+    # one pack per post id, whatever forms its url was saved under
+    seen, post_dicts = set(), []
+    for data in iter_source_posts(backend, root):
+        key = post_id_from_url(data.get("url")) or data.get("url")
+        if key in seen:
+            continue
+        seen.add(key)
+        post_dicts.append(data)
+
+    packed = write_pack(post_dicts, pack_path)
+    before, after = source_size(backend, root), os.path.getsize(pack_path)
+    print(
+        f"Packed {packed} posts: {before / 1e6:.1f}MB -> {after / 1e6:.1f}MB "
+        f"({after / max(before, 1):.0%})"
+    )
+    return packed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compressed corpus archive")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = subparsers.add_parser(
+        "compact", help="pack the corpus into reddit_corpus.pack"
+    )
+    compact_parser.add_argument("--backend", default="folder", choices=("folder", "sqlite"))
+    compact_parser.add_argument("--root", default=".")
+    compact_parser.add_argument("--out", default=None)
+
+    stats_parser = subparsers.add_parser("stats", help="summarize a pack")
+    stats_parser.add_argument("pack", nargs="?", default="reddit_corpus.pack")
+
+    args = parser.parse_args()
+    if args.command == "compact":
+        compact(args.backend, args.root, args.out)
+    elif args.command == "stats":
+        pack = CorpusPack(args.pack)
+        complete = len(pack.query())
+        print(
+            f"{len(pack)} posts ({complete} complete) in "
+            f"{os.path.getsize(args.pack) / 1e6:.1f}MB"
+        )
+        pack.close()
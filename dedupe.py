@@ -0,0 +1,241 @@
+import hashlib
+import random
+import re
+import sqlite3
+import struct
+import threading
+
+
+# MinHash signature of NUM_PERMUTATIONS values, split into LSH_BANDS bands
+# of LSH_ROWS rows. Posts sharing any whole band become candidates, which
+# catches pairs above roughly (1 / LSH_BANDS) ** (1 / LSH_ROWS) ~= 0.5 jaccard
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+# estimated jaccard similarity of word 3-grams above which a post counts
+# as a near duplicate (a repost with an edit or a crosspost with a footer)
+NEAR_DUPLICATE_SIMILARITY = 0.6
+
+# shorter texts share too many shingles by chance to be compared reliably
+MIN_SHINGLES = 8
+
+# posts fingerprinted per transaction when building over an existing
+# corpus; each batch holds the write lock for a fraction of a second
+BUILD_BATCH_SIZE = 50
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# fixed seed: signatures have to stay comparable across runs
+_rng = random.Random(1337)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def shingles(text, size=3):
+    words = re.findall(r"[a-z0-9']+", (text or "").lower())
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(text):
+    """MinHash signature (a tuple of ints) of text, or None if text is too short."""
+    features = shingles(text)
+    if len(features) < MIN_SHINGLES:
+        return None
+
+    values = [
+        int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=4).digest(), "big")
+        for f in features
+    ]
+    return tuple(
+        min(((a * value + b) % _MERSENNE_PRIME) & _MAX_HASH for value in values)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def similarity(signature_a, signature_b):
+    """Estimated jaccard similarity of the two shingle sets."""
+    same = sum(1 for a, b in zip(signature_a, signature_b) if a == b)
+    return same / NUM_PERMUTATIONS
+
+
+def band_keys(signature):
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS : (band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(struct.pack(f"<{LSH_ROWS}I", *rows), digest_size=8)
+        keys.append(int.from_bytes(digest.digest(), "big", signed=True))
+    return keys
+
+
+def pack_signature(signature):
+    return struct.pack(f"<{NUM_PERMUTATIONS}I", *signature)
+
+
+def unpack_signature(blob):
+    return struct.unpack(f"<{NUM_PERMUTATIONS}I", blob)
+
+
+def post_text(data):
+    return f"{data.get('title') or ''}\n{data.get('content') or ''}"
+
+
+class FingerprintIndex:
+    """
+    MinHash signatures of every saved post plus an LSH band table, so
+    near-duplicate candidates come from a few indexed lookups instead of
+    a scan over the corpus.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path="reddit_fingerprints.sqlite"):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    url TEXT PRIMARY KEY,
+                    signature BLOB,
+                    duplicate_of TEXT
+                )
+                """
+            )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bands (
+                    band INTEGER NOT NULL,
+                    band_key INTEGER NOT NULL,
+                    url TEXT NOT NULL
+                )
+                """
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, band_key)"
+            )
+            # add() clears a post's old bands by url on every save
+            self.conn.execute("CREATE INDEX IF NOT EXISTS bands_url ON bands (url)")
+
+    def needs_build(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        return version != self.SCHEMA_VERSION
+
+    def build(self, post_dicts, batch_size=BUILD_BATCH_SIZE):
+        """
+        Fingerprint an existing corpus. Near-duplicates in it get flagged.
+        Commits every batch_size posts, so saves from other threads and
+        processes get in between batches, and an interrupted build picks
+        up where it stopped.
+        """
+        print(f"Fingerprinting the existing corpus into {self.db_path}...")
+        flagged = 0
+        batch = []
+        for count, data in enumerate(post_dicts, start=1):
+            if data.get("url"):
+                batch.append(data)
+            if len(batch) >= batch_size:
+                flagged += self._build_batch(batch)
+                batch = []
+                print(f"Fingerprinted post {count}", end="\r")
+        flagged += self._build_batch(batch)
+
+        with self.lock, self.conn:
+            self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        print(f"\nFlagged {flagged} near-duplicate posts.")
+
+    def _build_batch(self, batch):
+        # hash outside the lock, it is the slow part
+        signatures = [(data["url"], minhash(post_text(data))) for data in batch]
+        flagged = 0
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for url, signature in signatures:
+                    exists = self.conn.execute(
+                        "SELECT 1 FROM fingerprints WHERE url = ?", (url,)
+                    ).fetchone()
+                    # saved since the build started, or fingerprinted by
+                    # an earlier (or concurrent) build
+                    if exists:
+                        continue
+                    duplicate_of = self._find_near_duplicate(signature, exclude_url=url)
+                    self._add(url, signature, duplicate_of)
+                    flagged += duplicate_of is not None
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+        return flagged
+
+    def find_near_duplicate(
+        self, signature, threshold=NEAR_DUPLICATE_SIMILARITY, exclude_url=None
+    ):
+        """
+        Url of the most similar stored post at or above threshold, or None.
+        exclude_url is the post being checked, which must not match itself.
+        """
+        with self.lock:
+            return self._find_near_duplicate(signature, threshold, exclude_url)
+
+    def _find_near_duplicate(
+        self, signature, threshold=NEAR_DUPLICATE_SIMILARITY, exclude_url=None
+    ):
+        if signature is None:
+            return None
+
+        candidates = set()
+        for band, key in enumerate(band_keys(signature)):
+            rows = self.conn.execute(
+                "SELECT url FROM bands WHERE band = ? AND band_key = ?",
+                (band, key),
+            ).fetchall()
+            candidates.update(row[0] for row in rows)
+        candidates.discard(exclude_url)
+
+        best_url, best_similarity = None, threshold
+        for url in candidates:
+            row = self.conn.execute(
+                "SELECT signature FROM fingerprints WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None or row[0] is None:
+                continue
+            score = similarity(signature, unpack_signature(row[0]))
+            if score >= best_similarity:
+                best_url, best_similarity = url, score
+        return best_url
+
+    def add(self, url, signature, duplicate_of=None):
+        with self.lock, self.conn:
+            self._add(url, signature, duplicate_of)
+
+    def _add(self, url, signature, duplicate_of=None):
+        blob = pack_signature(signature) if signature is not None else None
+        self.conn.execute(
+            "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?)",
+            (url, blob, duplicate_of),
+        )
+        self.conn.execute("DELETE FROM bands WHERE url = ?", (url,))
+        if signature is not None:
+            self.conn.executemany(
+                "INSERT INTO bands VALUES (?, ?, ?)",
+                [(band, key, url) for band, key in enumerate(band_keys(signature))],
+            )
+
+    def contains(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM fingerprints WHERE url = ?", (url,)
+            ).fetchone()
+        return row is not None
+
+    def flagged_urls(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT url FROM fingerprints WHERE duplicate_of IS NOT NULL"
+            ).fetchall()
+        return {row[0] for row in rows}
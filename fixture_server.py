@@ -0,0 +1,92 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+CONTENT_TYPES = {
+    ".json": "application/json; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+}
+
+
+def fixture_file_name(url, extension):
+    """
+    Map a url (or just its path and query) to a flat, filesystem-safe name.
+    "https://www.reddit.com/r/tifu/.json?limit=100" and "/r/tifu/.json?limit=100"
+    map to the same fixture.
+    """
+    parts = urlsplit(url)
+    key = parts.path + (f"?{parts.query}" if parts.query else "")
+    slug = re.sub(r"[^A-Za-z0-9._=-]+", "_", key.strip("/"))[:100]
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:10]
+    return f"{slug}_{digest}{extension}"
+
+
+class FixtureServer:
+    """
+    Local stand-in for reddit. Serves the files in fixtures_dir, looked up
+    by fixture_file_name() of the request path, on a background thread.
+    delay adds a fixed latency to every response to mimic a real network.
+    """
+
+    def __init__(self, fixtures_dir, port=0, delay=0.0):
+        self.fixtures_dir = fixtures_dir
+        self.delay = delay
+        self.requests_served = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests_served += 1
+                if server.delay:
+                    time.sleep(server.delay)
+
+                for extension, content_type in CONTENT_TYPES.items():
+                    file_path = os.path.join(
+                        server.fixtures_dir, fixture_file_name(self.path, extension)
+                    )
+                    if os.path.exists(file_path):
+                        with open(file_path, "rb") as f:
+                            body = f.read()
+                        self.send_response(200)
+                        self.send_header("Content-Type", content_type)
+                        self.send_header("Content-Length", str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+                        return
+
+                self.send_error(404, f"No fixture recorded for {self.path}")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"Serving fixtures from {self.fixtures_dir} at {self.base_url}")
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
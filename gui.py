@@ -4,7 +4,7 @@ import threading
 import random
 import os
 
-from scraper import scrape_all_threads
+from scraper import scrape_all_threads, DataSaver
 from video_maker import create_all_stacked_reddit_scroll_videos
 
 
@@ -19,6 +19,7 @@ class App(tk.Tk):
             "posts_scraped": 0,
             "videos_created": 0,
         }
+        self.data_saver = DataSaver()
 
         # Container for all pages
         self.container = tk.Frame(self, bg="#1e1e1e")
@@ -44,14 +45,9 @@ class App(tk.Tk):
         self.frames[page_class].tkraise()
 
     def refresh_stats(self):
-        scraped_posts_folder = r"reddit_data"
         final_videos_folder = r"final_vids"
 
-        scraped_posts_count = (
-            len(os.listdir(scraped_posts_folder))
-            if os.path.exists(scraped_posts_folder)
-            else 0
-        )
+        scraped_posts_count = self.data_saver.count()
         final_videos_count = (
             len(os.listdir(final_videos_folder))
             if os.path.exists(final_videos_folder)
@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import html
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from fixture_server import FixtureServer, fixture_file_name
+from post_ids import canonical_post_url
+from scraper import DataSaver, Post
+
+
+REDDIT_BASE_URL = "https://www.reddit.com"
+USER_AGENT = "python:reddit-sludge-scraper:0.1 (by /u/sludge_scraper)"
+
+
+def subreddit_path(thread_link):
+    # https://www.reddit.com/r/tifu/ -> /r/tifu
+    return urlsplit(thread_link).path.rstrip("/")
+
+
+class RedditJsonScraper:
+    """
+    Scraper backend that reads reddit's .json endpoints over one pooled
+    async http client instead of rendering pages in chrome. Produces the
+    same Post objects and DataSaver writes as RedditScraper.
+
+    base_url points the requests somewhere else (the FixtureServer for
+    offline runs); stored post urls always use the real reddit host so
+    they dedupe against posts from the selenium scraper.
+    """
+
+    def __init__(self, base_url=REDDIT_BASE_URL, max_connections=16, saver=None):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.saver = saver or DataSaver()
+        self.icon_cache = {}
+
+    def make_client(self):
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+            timeout=15,
+            follow_redirects=True,
+        )
+
+    async def get_json(self, client, path, params=None):
+        response = await client.get(path, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def get_subreddit_icon(self, client, thread_name):
+        if thread_name not in self.icon_cache:
+            icon = None
+            try:
+                about = await self.get_json(client, f"/r/{thread_name}/about.json")
+                icon = about["data"].get("community_icon") or about["data"].get(
+                    "icon_img"
+                )
+            except Exception as e:
+                print(f"[!] Could not get the icon for r/{thread_name}: {e}")
+            self.icon_cache[thread_name] = html.unescape(icon) if icon else None
+        return self.icon_cache[thread_name]
+
+    async def post_from_data(self, client, data):
+        thread_name = data.get("subreddit")
+        return Post(
+            username=data.get("author"),
+            profile_img=await self.get_subreddit_icon(client, thread_name),
+            content=html.unescape(data["selftext"]) if data.get("selftext") else None,
+            thread_name=thread_name,
+            title=html.unescape(data["title"]) if data.get("title") else None,
+            url=canonical_post_url(REDDIT_BASE_URL + data["permalink"]),
+        )
+
+    async def get_posts(self, client, thread_link, max_posts=50, max_pages=40):
+        """
+        Page through a subreddit listing and return new Posts.
+        Listings already carry the full selftext, so no per-post request
+        is needed on this path.
+        """
+        path = subreddit_path(thread_link) + "/.json"
+        posts = []
+        after = None
+        for _ in range(max_pages):
+            params = {"limit": 100}
+            if after:
+                params["after"] = after
+            listing = await self.get_json(client, path, params=params)
+
+            for child in listing["data"]["children"]:
+                data = child["data"]
+                if data.get("stickied"):
+                    continue
+                if self.saver.data_exists(REDDIT_BASE_URL + data["permalink"]):
+                    continue
+                posts.append(await self.post_from_data(client, data))
+                if len(posts) >= max_posts:
+                    return posts
+
+            after = listing["data"].get("after")
+            if not after:
+                break
+            print(f"{path}: collected {len(posts)} new posts")
+        return posts
+
+    async def get_post_content(self, client, post_link):
+        path = urlsplit(post_link).path.rstrip("/") + "/.json"
+        listings = await self.get_json(client, path)
+        data = listings[0]["data"]["children"][0]["data"]
+        return await self.post_from_data(client, data)
+
+    async def scrape_thread(self, client, thread_link, posts_to_scrape, stop_flag=None):
+        try:
+            posts = await self.get_posts(client, thread_link, max_posts=posts_to_scrape)
+        except Exception as e:
+            print(f"Error scraping thread {thread_link}: {e}")
+            return 0
+
+        saved = 0
+        for post in posts:
+            if stop_flag is not None and stop_flag.is_set():
+                print(f"[!] Stopping thread for {thread_link}")
+                break
+            saved += self.saver.save_post_data(post)
+        return saved
+
+    async def scrape_all_threads(
+        self, threads_to_scrape, posts_to_scrape, stop_flag=None
+    ):
+        async with self.make_client() as client:
+            results = await asyncio.gather(
+                *(
+                    self.scrape_thread(client, thread, posts_to_scrape, stop_flag)
+                    for thread in dict.fromkeys(threads_to_scrape)
+                )
+            )
+        return sum(results)
+
+
+def scrape_all_threads_json(threads_to_scrape, posts_to_scrape: int, stop_flag):
+    """Drop-in for scraper.scrape_all_threads that uses the json backend."""
+    scraper = RedditJsonScraper()
+    t = threading.Thread(
+        target=asyncio.run,
+        args=(scraper.scrape_all_threads(threads_to_scrape, posts_to_scrape, stop_flag),),
+    )
+    t.start()
+    return [t]
+
+
+def write_synthetic_fixtures(
+    fixtures_dir, subreddits, posts_per_subreddit, page_size=100
+):
+    """
+    Fill fixtures_dir with fake listing, about and post json shaped like
+    reddit's, so the json backend can be tested and benchmarked offline.
+    """
+    os.makedirs(fixtures_dir, exist_ok=True)
+
+    def write(url, payload):
+        file_path = os.path.join(fixtures_dir, fixture_file_name(url, ".json"))
+        with open(file_path, "w") as f:
+            json.dump(payload, f)
+
+    words = "my landlord said the cat was never allowed so i told him".split()
+    for subreddit in subreddits:
+        icon = f"https://example.com/{subreddit}.png?width=256&amp;s=abc"
+        write(
+            f"/r/{subreddit}/about.json",
+            {"kind": "t5", "data": {"community_icon": icon}},
+        )
+
+        children = []
+        for i in range(posts_per_subreddit):
+            # the whole subreddit name, so ids don't collide across subreddits
+            post_id = f"{re.sub(r'[^a-z0-9]', '', subreddit.lower())}{i:05d}"
+            permalink = f"/r/{subreddit}/comments/{post_id}/synthetic_post_{i}/"
+            data = {
+                "id": post_id,
+                "subreddit": subreddit,
+                "author": f"user_{random.randint(1000, 9999)}",
+                "title": f"TIFU by writing synthetic post {i}",
+                "selftext": " ".join(random.choices(words, k=random.randint(60, 300))),
+                "permalink": permalink,
+                "stickied": False,
+            }
+            children.append({"kind": "t3", "data": data})
+            write(
+                f"{permalink}.json",
+                [
+                    {"kind": "Listing", "data": {"children": [children[-1]]}},
+                    {"kind": "Listing", "data": {"children": []}},
+                ],
+            )
+
+        pages = [
+            children[i : i + page_size] for i in range(0, len(children), page_size)
+        ]
+        after = None
+        for page_index, page in enumerate(pages):
+            is_last_page = page_index == len(pages) - 1
+            next_after = None if is_last_page else f"t3_{page[-1]['data']['id']}"
+            query = f"limit=100&after={after}" if after else "limit=100"
+            write(
+                f"/r/{subreddit}/.json?{query}",
+                {"kind": "Listing", "data": {"after": next_after, "children": page}},
+            )
+            after = next_after
+
+
+def benchmark_offline(
+    subreddits=10, posts_per_subreddit=200, delay=0.05, max_connections=16
+):
+    """Scrape synthetic fixtures through the local server and report posts/sec."""
+    work_dir = tempfile.mkdtemp(prefix="json_scraper_bench_")
+    try:
+        fixtures_dir = os.path.join(work_dir, "fixtures")
+        thread_names = [f"bench{i}" for i in range(subreddits)]
+        write_synthetic_fixtures(fixtures_dir, thread_names, posts_per_subreddit)
+
+        with FixtureServer(fixtures_dir, delay=delay) as server:
+            scraper = RedditJsonScraper(
+                base_url=server.base_url,
+                max_connections=max_connections,
+                saver=DataSaver(root=os.path.join(work_dir, "corpus")),
+            )
+            threads = [f"{REDDIT_BASE_URL}/r/{name}/" for name in thread_names]
+            start_time = time.time()
+            saved = asyncio.run(scraper.scrape_all_threads(threads, posts_per_subreddit))
+            elapsed = time.time() - start_time
+            requests_served = server.requests_served
+            corpus_size = scraper.saver.count()
+
+        print("\n--- json backend benchmark ---")
+        print(f"Saved {saved} posts in {elapsed:.2f}s ({saved / elapsed:.1f} posts/s)")
+        print(f"{corpus_size} posts in the corpus")
+        print(f"{requests_served} http requests, {delay * 1000:.0f}ms simulated latency each")
+        return saved / elapsed
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reddit json scraping backend")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scrape_parser = subparsers.add_parser("scrape", help="scrape subreddits into the corpus")
+    scrape_parser.add_argument("threads", nargs="+")
+    scrape_parser.add_argument("--posts", type=int, default=500)
+
+    bench_parser = subparsers.add_parser("bench", help="offline benchmark against fixtures")
+    bench_parser.add_argument("--subreddits", type=int, default=10)
+    bench_parser.add_argument("--posts", type=int, default=200)
+    bench_parser.add_argument("--delay", type=float, default=0.05)
+    bench_parser.add_argument("--connections", type=int, default=16)
+
+    args = parser.parse_args()
+    if args.command == "scrape":
+        asyncio.run(RedditJsonScraper().scrape_all_threads(args.threads, args.posts))
+    elif args.command == "bench":
+        benchmark_offline(args.subreddits, args.posts, args.delay, args.connections)
@@ -80,10 +80,9 @@ def remove_emojis_from_text(text):
     return emoji_pattern.sub(r"", text)
 
 
-def narrate(voice, text):
+def narrate(voice, text, output_folder="narrations"):
     text = remove_emojis_from_text(text)
 
-    output_folder = r"narrations"
     os.makedirs(output_folder, exist_ok=True)
     this_audio_save_index = len(os.listdir(output_folder))
     files_in_dir = os.listdir(output_folder)
@@ -0,0 +1,52 @@
+import json
+import os
+import re
+import threading
+
+from fixture_server import fixture_file_name
+
+
+# recorded pages are replayed offline, so nothing in them may reach out
+# to reddit's servers for scripts when they load again
+SCRIPT_TAG_PATTERN = re.compile(
+    r"<script\b[^>]*>.*?</script\s*>", re.DOTALL | re.IGNORECASE
+)
+
+
+class PageRecorder:
+    """
+    Saves the listing and post pages a RedditScraper visits into
+    fixtures_dir, named so FixtureServer can serve them back. manifest.json
+    keeps which urls were listings and which were posts.
+    """
+
+    def __init__(self, fixtures_dir="scraper_fixtures"):
+        self.fixtures_dir = fixtures_dir
+        os.makedirs(fixtures_dir, exist_ok=True)
+        self.manifest_path = os.path.join(fixtures_dir, "manifest.json")
+        self.lock = threading.Lock()
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {"listings": [], "posts": []}
+        with open(self.manifest_path, "r") as f:
+            return json.load(f)
+
+    def _record(self, kind, url, page_source):
+        page_source = SCRIPT_TAG_PATTERN.sub("", page_source)
+        file_path = os.path.join(self.fixtures_dir, fixture_file_name(url, ".html"))
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(page_source)
+
+        with self.lock:
+            manifest = self.load_manifest()
+            if url not in manifest[kind]:
+                manifest[kind].append(url)
+            with open(self.manifest_path, "w") as f:
+                json.dump(manifest, f, indent=4)
+
+    def record_listing(self, url, page_source):
+        self._record("listings", url, page_source)
+
+    def record_post(self, url, page_source):
+        self._record("posts", url, page_source)
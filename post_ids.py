@@ -0,0 +1,85 @@
+import math
+import re
+from urllib.parse import urlsplit
+
+
+REDDIT_BASE_URL = "https://www.reddit.com"
+
+POST_PATH_PATTERN = re.compile(
+    r"^(?:/r/([^/]+))?/comments/([a-z0-9]+)", re.IGNORECASE
+)
+
+
+def post_id_from_url(url):
+    # https://www.reddit.com/r/tifu/comments/1lu69qb/some_slug/ -> 1lu69qb
+    match = re.search(r"/comments/([a-z0-9]+)", url or "", re.IGNORECASE)
+    return match.group(1).lower() if match else None
+
+
+def canonical_post_url(url):
+    """
+    One url per post, whatever form the link came in:
+    old./www./no host, trailing slash or not, query strings, slug variations
+    https://old.reddit.com/r/tifu/comments/1LU69QB/slug?utm=x
+        -> https://www.reddit.com/r/tifu/comments/1lu69qb/
+    Links that are not post links come back unchanged.
+    """
+    if not url:
+        return url
+    match = POST_PATH_PATTERN.match(urlsplit(url).path)
+    if match is None:
+        return url
+    thread_name, post_id = match.groups()
+    if thread_name is None:
+        return f"{REDDIT_BASE_URL}/comments/{post_id.lower()}/"
+    return f"{REDDIT_BASE_URL}/r/{thread_name}/comments/{post_id.lower()}/"
+
+
+class BloomFilter:
+    """
+    In-memory set of post ids that can say "definitely not seen" without a
+    disk lookup. False positives (about false_positive_rate once capacity
+    ids are in) fall through to the on-disk index; there are no false
+    negatives. Roughly 1.2MB per million ids at 1%.
+    """
+
+    def __init__(self, capacity=100_000, false_positive_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(
+            64, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, post_id):
+        # post ids are base 36 integers; double hashing off two multiplicative
+        # mixes of it stands in for hash_count independent hashes
+        value = int(post_id, 36)
+        h1 = (value * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        h2 = ((value * 0xC2B2AE3D27D4EB4F) & 0xFFFFFFFFFFFFFFFF) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, post_id):
+        for position in self._positions(post_id):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, post_id):
+        # inlined _positions with an early exit: most listing links are new
+        # posts, which usually miss on the first bit
+        value = int(post_id, 36)
+        position = (value * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        step = ((value * 0xC2B2AE3D27D4EB4F) & 0xFFFFFFFFFFFFFFFF) | 1
+        bits, size = self.bits, self.size
+        for _ in range(self.hash_count):
+            index = position % size
+            if not bits[index >> 3] & (1 << (index & 7)):
+                return False
+            position += step
+        return True
+
+    def update(self, post_ids):
+        for post_id in post_ids:
+            if post_id is not None:
+                self.add(post_id)
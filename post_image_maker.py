@@ -19,6 +19,12 @@ font_title = ImageFont.truetype(FONT_TITLE, size=18)
 font_body = ImageFont.truetype(FONT_BODY, size=14)
 font_search = ImageFont.truetype(FONT_SEARCH, size=12)
 
+# posts outside these limits get cut off in the rendered image
+BODY_TEXT_MAX_LENGTH = 900
+BODY_TEXT_MIN_LENGTH = 300
+THREAD_NAME_MAX_LENGTH = 17
+USERNAME_MAX_LENGTH = 27
+
 
 def crop_image(image_path, left, top, right, bottom, save=False):
     image = cv2.imread(image_path)
@@ -85,6 +91,7 @@ def make_reddit_post_image(
     username,
     expected_width,
     save=True,
+    save_path="reddit_post_images",
 ):
     if None in [
         thread,
@@ -96,11 +103,6 @@ def make_reddit_post_image(
     ]:
         return None
 
-    BODY_TEXT_MAX_LENGTH = 900
-    BODY_TEXT_MIN_LENGTH = 300
-    THREAD_NAME_MAX_LENGTH = 17
-    USERNAME_MAX_LENGTH = 27
-
     if len(body_text) > BODY_TEXT_MAX_LENGTH:
         # print("[!] Error: your body text is too long itll be cut off")
         return None
@@ -190,7 +192,7 @@ def make_reddit_post_image(
     img = resize_image_keep_aspect_ratio(img, expected_width)
 
     if save:
-        image_saver = ImageSaver()
+        image_saver = ImageSaver(save_path)
         image_path = image_saver.save_image(
             img,
             thread,
@@ -0,0 +1,182 @@
+import json
+import os
+import sqlite3
+import threading
+
+from post_ids import post_id_from_url
+from post_store import ATTRIBUTE_FIELDS, eligibility_filter, post_attributes
+
+
+class PostIndex:
+    """
+    On-disk url index for the json files in reddit_data/.
+    Answers "have we saved this post?" without opening every file.
+    Also keeps the eligibility attributes of each post (see post_store.py)
+    so video jobs can query for usable posts without opening them.
+    Posts are matched on their reddit post id, so the same post saved
+    under another form of its url still counts as saved.
+    Rebuilds itself from the existing json files the first time it runs.
+    """
+
+    SCHEMA_VERSION = 3
+
+    def __init__(self, data_folder_path="reddit_data", db_path="reddit_url_index.sqlite"):
+        self.data_folder_path = data_folder_path
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+
+        # rebuild on first run or on schema changes; files copied in or
+        # deleted by hand are picked up one by one
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            self.rebuild(only_if_stale=True)
+        self.reconcile()
+
+    def _json_files(self):
+        return {f for f in os.listdir(self.data_folder_path) if f.endswith(".json")}
+
+    def _read_post_file(self, file_name):
+        file_path = os.path.join(self.data_folder_path, file_name)
+        # unreadable files still get a row so they aren't retried forever
+        try:
+            with open(file_path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"[!] Could not read post file {file_path}: {e}")
+            return {}
+
+    def _create_table(self, table):
+        self.conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                file_name TEXT PRIMARY KEY,
+                url TEXT,
+                post_id TEXT,
+                content_len INTEGER,
+                title_len INTEGER,
+                thread_len INTEGER,
+                username_len INTEGER,
+                complete INTEGER
+            )
+            """
+        )
+
+    def rebuild(self, only_if_stale=False):
+        """
+        Rebuild the index from the json files. The files are read first,
+        then swapped in as a new table in one write transaction, so other
+        processes keep querying the old table until then.
+        """
+        print(f"Building the post url index from {self.data_folder_path}...")
+        rows = [
+            (file_name, self._read_post_file(file_name))
+            for file_name in self._json_files()
+        ]
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+                if only_if_stale and version == self.SCHEMA_VERSION:
+                    # another process rebuilt it while we were reading
+                    self.conn.commit()
+                    return
+                self.conn.execute("DROP TABLE IF EXISTS posts_rebuild")
+                self._create_table("posts_rebuild")
+                for file_name, data in rows:
+                    self._insert(file_name, data, table="posts_rebuild")
+                self.conn.execute("DROP TABLE IF EXISTS posts")
+                self.conn.execute("ALTER TABLE posts_rebuild RENAME TO posts")
+                self.conn.execute("CREATE INDEX IF NOT EXISTS posts_url ON posts (url)")
+                self.conn.execute(
+                    "CREATE INDEX IF NOT EXISTS posts_post_id ON posts (post_id)"
+                )
+                self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+        print(f"Indexed {len(rows)} saved posts.")
+
+    def reconcile(self):
+        """Index json files missing from the index and drop rows of deleted ones."""
+        # index first: a file saved in between then only shows up as missing
+        with self.lock:
+            indexed = {
+                row[0] for row in self.conn.execute("SELECT file_name FROM posts")
+            }
+        files = self._json_files()
+        missing, gone = files - indexed, indexed - files
+        if not missing and not gone:
+            return
+        rows = [(file_name, self._read_post_file(file_name)) for file_name in missing]
+        with self.lock, self.conn:
+            # a saver that wrote its file but hasn't indexed it yet will, with
+            # the full post, so never replace a row here
+            for file_name, data in rows:
+                self._insert(file_name, data, replace=False)
+            self.conn.executemany(
+                "DELETE FROM posts WHERE file_name = ?", [(f,) for f in gone]
+            )
+        print(f"Index caught up: {len(missing)} posts added, {len(gone)} removed.")
+
+    def contains(self, url):
+        post_id = post_id_from_url(url)
+        with self.lock:
+            if post_id is not None:
+                row = self.conn.execute(
+                    "SELECT 1 FROM posts WHERE post_id = ?", (post_id,)
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    "SELECT 1 FROM posts WHERE url = ?", (url,)
+                ).fetchone()
+        return row is not None
+
+    def post_ids(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT post_id FROM posts WHERE post_id IS NOT NULL"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _insert(self, file_name, data, table="posts", replace=True):
+        columns = ("file_name", "url", "post_id") + ATTRIBUTE_FIELDS
+        self.conn.execute(
+            f"""
+            INSERT OR {"REPLACE" if replace else "IGNORE"} INTO {table} ({", ".join(columns)})
+            VALUES ({", ".join("?" for _ in columns)})
+            """,
+            (
+                file_name,
+                data.get("url"),
+                post_id_from_url(data.get("url")),
+                *post_attributes(data).values(),
+            ),
+        )
+
+    def add(self, file_name, data):
+        with self.lock, self.conn:
+            self._insert(file_name, data)
+
+    def query(self, **criteria):
+        """(url, file_name) of every complete post matching the criteria."""
+        where, params = eligibility_filter(**criteria)
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT url, file_name FROM posts WHERE {where}", params
+            ).fetchall()
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    index = PostIndex()
+    index.rebuild()
+    print(f"There are {index.count()} posts in the index.")
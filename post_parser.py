@@ -0,0 +1,85 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from lxml import html as lxml_html
+
+
+# parsing a post takes milliseconds and lxml drops the GIL while it
+# parses, so a few threads keep up with every browser
+PARSER_WORKERS = min(4, os.cpu_count() or 1)
+
+# block level tags inside a post body; each one becomes its own paragraph
+BODY_BLOCK_TAGS = {
+    "p", "li", "blockquote", "pre", "h1", "h2", "h3", "h4", "h5", "h6"
+}
+
+
+def clean_text(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def body_text(element):
+    # roughly what the browser gives for innerText: one line per block
+    blocks = [
+        clean_text(child.text_content())
+        for child in element.iter()
+        if child.tag in BODY_BLOCK_TAGS
+        and child.getparent().tag not in ("li", "blockquote")
+    ]
+    blocks = [block for block in blocks if block]
+    if blocks:
+        return "\n\n".join(blocks)
+    return clean_text(element.text_content())
+
+
+def parse_post_html(page_source):
+    """
+    Pull the post fields out of a rendered post page's html.
+    Returns a dict with the same keys get_post_content collects; fields
+    missing from the page are left out.
+    """
+    tree = lxml_html.fromstring(page_source)
+
+    def first(selector):
+        elements = tree.cssselect(selector)
+        return elements[0] if elements else None
+
+    found = {}
+
+    author = first("a.author-name")
+    if author is not None:
+        found["username"] = clean_text(author.text_content())
+
+    icon = first("img.shreddit-subreddit-icon__icon")
+    if icon is not None and icon.get("src"):
+        found["profile_img"] = icon.get("src")
+
+    body = first("div.md")
+    if body is not None:
+        found["content"] = body_text(body)
+
+    title = first("h1[id^='post-title-']")
+    if title is not None:
+        found["title"] = clean_text(title.text_content())
+
+    return found
+
+
+_parser_pool = None
+_parser_pool_lock = threading.Lock()
+
+
+def get_parser_pool(workers=None):
+    """Thread pool shared by every scraper in this process."""
+    global _parser_pool
+    with _parser_pool_lock:
+        if _parser_pool is None:
+            # threads, not processes: a worker process would have to
+            # re-import the main script, and with it the whole video stack
+            _parser_pool = ThreadPoolExecutor(
+                max_workers=workers or PARSER_WORKERS,
+                thread_name_prefix="post-parser",
+            )
+        return _parser_pool
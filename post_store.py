@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+
+from post_ids import post_id_from_url
+
+POST_FIELDS = ("username", "profile_img", "content", "thread_name", "title", "url")
+
+# precomputed at save time so video jobs can select posts without loading them
+ATTRIBUTE_FIELDS = ("content_len", "title_len", "thread_len", "username_len", "complete")
+
+
+def post_attributes(data):
+    def length(field):
+        value = data.get(field)
+        return len(value) if value is not None else None
+
+    return {
+        "content_len": length("content"),
+        "title_len": length("title"),
+        "thread_len": length("thread_name"),
+        "username_len": length("username"),
+        "complete": int(None not in (data.get(field) for field in POST_FIELDS)),
+    }
+
+
+def eligibility_filter(
+    min_content_len=None,
+    max_content_len=None,
+    max_thread_len=None,
+    max_username_len=None,
+):
+    """Build a WHERE clause (and its params) over the attribute columns."""
+    clauses = ["complete = 1"]
+    params = []
+    if min_content_len is not None:
+        clauses.append("content_len >= ?")
+        params.append(min_content_len)
+    if max_content_len is not None:
+        clauses.append("content_len <= ?")
+        params.append(max_content_len)
+    if max_thread_len is not None:
+        clauses.append("thread_len <= ?")
+        params.append(max_thread_len)
+    if max_username_len is not None:
+        clauses.append("username_len <= ?")
+        params.append(max_username_len)
+    return " AND ".join(clauses), params
+
+
+class PostStore:
+    """
+    Single-file post corpus backed by sqlite.
+    Posts are only ever appended, and iter_posts() streams them back
+    in insertion order with one sequential read.
+    """
+
+    def __init__(self, db_path="reddit_corpus.sqlite"):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS posts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL UNIQUE,
+                    post_id TEXT,
+                    username TEXT,
+                    profile_img TEXT,
+                    content TEXT,
+                    thread_name TEXT,
+                    title TEXT,
+                    content_len INTEGER,
+                    title_len INTEGER,
+                    thread_len INTEGER,
+                    username_len INTEGER,
+                    complete INTEGER
+                )
+                """
+            )
+        self._add_attribute_columns()
+        self._add_post_id_column()
+        with self.conn:
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS posts_post_id ON posts (post_id)"
+            )
+
+    def _add_attribute_columns(self):
+        # stores created before the attribute columns existed get them backfilled
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(posts)")]
+        if "complete" in columns:
+            return
+        print(f"Adding eligibility attributes to {self.db_path}...")
+        with self.lock, self.conn:
+            for field in ATTRIBUTE_FIELDS:
+                self.conn.execute(f"ALTER TABLE posts ADD COLUMN {field} INTEGER")
+            rows = self.conn.execute(
+                f"SELECT id, {', '.join(POST_FIELDS)} FROM posts"
+            ).fetchall()
+            for row in rows:
+                attributes = post_attributes(dict(zip(POST_FIELDS, row[1:])))
+                self.conn.execute(
+                    f"""
+                    UPDATE posts SET {", ".join(f"{f} = ?" for f in ATTRIBUTE_FIELDS)}
+                    WHERE id = ?
+                    """,
+                    (*attributes.values(), row[0]),
+                )
+
+    def _add_post_id_column(self):
+        # posts are matched on their reddit post id rather than the raw url
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(posts)")]
+        if "post_id" in columns:
+            return
+        print(f"Adding post ids to {self.db_path}...")
+        with self.lock, self.conn:
+            self.conn.execute("ALTER TABLE posts ADD COLUMN post_id TEXT")
+            rows = self.conn.execute("SELECT id, url FROM posts").fetchall()
+            self.conn.executemany(
+                "UPDATE posts SET post_id = ? WHERE id = ?",
+                [(post_id_from_url(url), row_id) for row_id, url in rows],
+            )
+
+    def _contains(self, url):
+        post_id = post_id_from_url(url)
+        if post_id is None:
+            row = self.conn.execute(
+                "SELECT 1 FROM posts WHERE url = ?", (url,)
+            ).fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT 1 FROM posts WHERE post_id = ?", (post_id,)
+            ).fetchone()
+        return row is not None
+
+    def contains(self, url):
+        with self.lock:
+            return self._contains(url)
+
+    def post_ids(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT post_id FROM posts WHERE post_id IS NOT NULL"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def add(self, data):
+        """Append a post dict. Returns False if the post was already stored."""
+        columns = ("post_id",) + POST_FIELDS + ATTRIBUTE_FIELDS
+        values = (
+            (post_id_from_url(data.get("url")),)
+            + tuple(data.get(field) for field in POST_FIELDS)
+            + tuple(post_attributes(data).values())
+        )
+        with self.lock, self.conn:
+            if self._contains(data.get("url")):
+                return False
+            cursor = self.conn.execute(
+                f"""
+                INSERT OR IGNORE INTO posts ({", ".join(columns)})
+                VALUES ({", ".join("?" for _ in columns)})
+                """,
+                values,
+            )
+        return cursor.rowcount == 1
+
+    def query_urls(self, **criteria):
+        """Urls of every complete post matching the eligibility criteria."""
+        where, params = eligibility_filter(**criteria)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT url FROM posts WHERE {where}", params
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_post(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT {', '.join(POST_FIELDS)} FROM posts WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(POST_FIELDS, row))
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def iter_posts(self, batch_size=500):
+        # separate read connection so scrapers can keep appending while we stream
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            cursor = conn.execute(
+                f"SELECT {', '.join(POST_FIELDS)} FROM posts ORDER BY id"
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(POST_FIELDS, row))
+        finally:
+            conn.close()
+
+    def close(self):
+        self.conn.close()
+
+
+def migrate_folder(data_folder_path="reddit_data", db_path="reddit_corpus.sqlite"):
+    """Copy every json post in data_folder_path into the sqlite store."""
+    store = PostStore(db_path)
+    file_names = [f for f in os.listdir(data_folder_path) if f.endswith(".json")]
+    added, skipped = 0, 0
+    for i, file_name in enumerate(file_names):
+        file_path = os.path.join(data_folder_path, file_name)
+        try:
+            with open(file_path, "r") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[!] Skipping unreadable post file {file_path}: {e}")
+            skipped += 1
+            continue
+
+        if data.get("url") is None or not store.add(data):
+            skipped += 1
+        else:
+            added += 1
+        print(f"Migrated post {i + 1} / {len(file_names)}", end="\r")
+
+    print(f"\nMigrated {added} posts into {db_path} ({skipped} skipped).")
+    print(f"The store now holds {store.count()} posts.")
+    store.close()
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the sqlite post corpus")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser(
+        "migrate", help="copy the reddit_data/ json folder into the sqlite store"
+    )
+    migrate_parser.add_argument("--data-folder", default="reddit_data")
+    migrate_parser.add_argument("--db", default="reddit_corpus.sqlite")
+
+    args = parser.parse_args()
+    if args.command == "migrate":
+        migrate_folder(args.data_folder, args.db)
@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import threading
+import time
+
+from post_ids import post_id_from_url
+
+
+def usage_key(post_url):
+    # the same post under another form of its url is still the same post
+    return post_id_from_url(post_url) or post_url
+
+
+class PostUsageHistory:
+    """
+    Which posts have already been turned into videos, in an indexed
+    sqlite table shared by every video worker. Lookups hit an in-memory
+    set that catches up with other workers' rows on refresh(); claim()
+    is the race-free way to take a post.
+    The old post_usage_history.csv is imported the first time it runs.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(
+        self, db_path="post_usage_history.sqlite", csv_path="post_usage_history.csv"
+    ):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS used_posts (
+                    key TEXT PRIMARY KEY,
+                    url TEXT,
+                    used_at REAL
+                )
+                """
+            )
+
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            self._import_csv(csv_path)
+
+        self.used = set()
+        self.last_rowid = 0
+        self.refresh()
+
+    def _import_csv(self, csv_path):
+        urls = []
+        if os.path.exists(csv_path):
+            with open(csv_path, "r") as f:
+                urls = [url for url in f.read().strip().split(",") if url]
+            # placeholder row every new csv was created with
+            urls = [url for url in urls if not url.startswith("example_post_url")]
+            print(f"Importing {len(urls)} used posts from {csv_path}...")
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO used_posts VALUES (?, ?, ?)",
+                [(usage_key(url), url, None) for url in urls],
+            )
+            self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def refresh(self):
+        """Pull in posts other workers used since the last refresh."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT rowid, key FROM used_posts WHERE rowid > ? ORDER BY rowid",
+                (self.last_rowid,),
+            ).fetchall()
+        for rowid, key in rows:
+            self.used.add(key)
+            self.last_rowid = rowid
+
+    def claim(self, post_url):
+        """
+        Mark post_url as used. Returns False if it already was, by this
+        or any other worker, so only one worker ever gets a given post.
+        """
+        key = usage_key(post_url)
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO used_posts VALUES (?, ?, ?)",
+                (key, post_url, time.time()),
+            )
+        self.used.add(key)
+        return cursor.rowcount == 1
+
+    def add_post(self, post_url):
+        self.claim(post_url)
+
+    def get_all_posts(self):
+        """Urls of every used post."""
+        with self.lock:
+            rows = self.conn.execute("SELECT url FROM used_posts").fetchall()
+        return {row[0] for row in rows}
+
+    def post_exists(self, post_url):
+        key = usage_key(post_url)
+        if key in self.used:
+            return True
+        self.refresh()
+        return key in self.used
+
+    def close(self):
+        self.conn.close()
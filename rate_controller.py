@@ -0,0 +1,160 @@
+import threading
+import time
+
+
+# concurrency is the number of tabs a subreddit's posts are fetched over
+MIN_TABS = 1
+MAX_TABS = 6
+# pause between post loads (and between listing scrolls) per subreddit
+MIN_DELAY = 0.0
+MAX_DELAY = 30.0
+# once down to one tab, backing off doubles the delay (starting from
+# DELAY_STEP); a healthy stretch adds RATE_STEP page loads per second
+# back onto the paced rate, and a delay under DELAY_STEP goes to zero
+DELAY_STEP = 0.1
+RATE_STEP = 0.2
+
+# a stretch this many results long with no congestion earns an increase
+INCREASE_AFTER = 10
+# results to wait after a decrease (or tabs, if more) before another one,
+# so the latency average catches up with the new rate first
+DECREASE_COOLDOWN = 5
+# latency (EWMA) this many times over the best seen counts as congestion
+LATENCY_SLACK = 2.0
+BASELINE_DRIFT = 0.02
+# error / empty-content rate (EWMA) above which we back off
+MAX_ERROR_RATE = 0.2
+EWMA_WEIGHT = 0.2
+
+
+class SubredditRate:
+    def __init__(self, name, tabs):
+        self.name = name
+        self.tabs = tabs
+        self.delay = MIN_DELAY
+        self.latency = None
+        self.best_latency = None
+        self.error_rate = 0.0
+        self.healthy_streak = 0
+        # results since the last decrease; a burst of failures from pages
+        # already in flight should only cut the rate once
+        self.since_decrease = 0
+        self.results = 0
+        self.errors = 0
+        self.next_allowed = 0.0
+
+    def describe(self):
+        latency = f"{self.latency:.2f}s" if self.latency is not None else "-"
+        best = f"{self.best_latency:.2f}s" if self.best_latency is not None else "-"
+        return (
+            f"tabs {self.tabs} | delay {self.delay:.2f}s | "
+            f"latency {latency} (best {best}) | "
+            f"errors {self.error_rate:.0%} | {self.results} results"
+        )
+
+
+class RateController:
+    """
+    AIMD rate control per subreddit. Every fetched post reports its page
+    load latency and whether it came back empty or failed. Congestion
+    (errors, empty posts or latency well over the best seen) halves the
+    tabs, and once down to one tab doubles the delay between page loads.
+    A healthy stretch undoes it additively: first the paced rate comes
+    back, then tabs are added one at a time. Every change is printed.
+    """
+
+    def __init__(self, initial_tabs=MIN_TABS, max_tabs=MAX_TABS):
+        self.initial_tabs = max(MIN_TABS, min(initial_tabs, max_tabs))
+        self.max_tabs = max_tabs
+        self.lock = threading.Lock()
+        self.rates = {}
+
+    def _rate(self, thread_name):
+        if thread_name not in self.rates:
+            self.rates[thread_name] = SubredditRate(thread_name, self.initial_tabs)
+        return self.rates[thread_name]
+
+    def tabs(self, thread_name):
+        with self.lock:
+            return self._rate(thread_name).tabs
+
+    def delay(self, thread_name):
+        with self.lock:
+            return self._rate(thread_name).delay
+
+    def scroll_pause(self, thread_name, default=0.2):
+        return max(default, self.delay(thread_name))
+
+    def wait(self, thread_name):
+        """Sleep until the subreddit's pacing allows the next page load."""
+        with self.lock:
+            rate = self._rate(thread_name)
+            now = time.time()
+            start_at = max(now, rate.next_allowed)
+            rate.next_allowed = start_at + rate.delay
+        if start_at > now:
+            time.sleep(start_at - now)
+
+    def record(self, thread_name, latency=None, ok=True):
+        with self.lock:
+            rate = self._rate(thread_name)
+            rate.results += 1
+            rate.errors += not ok
+            rate.since_decrease += 1
+            rate.error_rate += EWMA_WEIGHT * ((not ok) - rate.error_rate)
+            if latency is not None and ok:
+                if rate.latency is None:
+                    rate.latency = latency
+                else:
+                    rate.latency += EWMA_WEIGHT * (latency - rate.latency)
+                if rate.best_latency is None or rate.latency < rate.best_latency:
+                    rate.best_latency = rate.latency
+                else:
+                    # drift up slowly, so a lasting slowdown becomes the new
+                    # normal instead of backing off forever
+                    rate.best_latency += BASELINE_DRIFT * (
+                        rate.latency - rate.best_latency
+                    )
+
+            slow = (
+                rate.latency is not None
+                and rate.latency > LATENCY_SLACK * rate.best_latency
+            )
+            congested = slow or (not ok and rate.error_rate > MAX_ERROR_RATE)
+            if congested:
+                rate.healthy_streak = 0
+                if rate.since_decrease >= max(rate.tabs, DECREASE_COOLDOWN):
+                    self._decrease(rate, "slow" if slow else "errors")
+            elif ok:
+                rate.healthy_streak += 1
+                if rate.healthy_streak >= INCREASE_AFTER:
+                    self._increase(rate)
+            else:
+                rate.healthy_streak = 0
+
+    def _decrease(self, rate, reason):
+        before = rate.describe()
+        if rate.tabs > MIN_TABS:
+            rate.tabs = max(MIN_TABS, rate.tabs // 2)
+        else:
+            rate.delay = min(MAX_DELAY, max(DELAY_STEP, rate.delay * 2))
+        rate.healthy_streak = 0
+        rate.since_decrease = 0
+        print(f"[rate r/{rate.name}] backing off ({reason}): {before} -> {rate.describe()}")
+
+    def _increase(self, rate):
+        rate.healthy_streak = 0
+        if rate.delay > MIN_DELAY:
+            rate.delay = 1 / (1 / rate.delay + RATE_STEP)
+            if rate.delay < DELAY_STEP:
+                rate.delay = MIN_DELAY
+        elif rate.tabs < self.max_tabs:
+            rate.tabs += 1
+        else:
+            return
+        print(f"[rate r/{rate.name}] speeding up: {rate.describe()}")
+
+    def summary(self):
+        with self.lock:
+            for rate in self.rates.values():
+                print(f"[rate r/{rate.name}] {rate.describe()}")
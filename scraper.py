@@ -1,16 +1,201 @@
 import threading
+import queue
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import (
+    SessionNotCreatedException,
+    TimeoutException,
+    WebDriverException,
+)
 from webdriver_manager.chrome import ChromeDriverManager
+import psutil
+from collections import deque
 import time
 import json
 import os
 import random
 
+from post_ids import BloomFilter, canonical_post_url, post_id_from_url
+from post_index import PostIndex
+from post_store import PostStore
+from corpus_pack import CorpusPack
+from post_parser import parse_post_html, get_parser_pool
+from dedupe import FingerprintIndex, minhash, post_text
+from rate_controller import RateController
+
+# where scraped posts live: "folder" (one json file per post in reddit_data/)
+# or "sqlite" (single append-only reddit_corpus.sqlite, see post_store.py).
+# "pack" reads a compacted reddit_corpus.pack (see corpus_pack.py) and
+# cannot be saved into, it is for video jobs selecting posts
+DATA_BACKEND = "folder"
+
+# what save_post_data does with a post whose title + content is a near
+# duplicate (MinHash similarity, see dedupe.py) of one already saved:
+# "skip" it, "flag" it (saved, but never handed out for videos) or "off"
+NEAR_DUPLICATE_POLICY = "skip"
+
+# how many chrome instances scrape_all_threads may run at once
+BROWSER_POOL_SIZE = 4
+
+# let a RateController (see rate_controller.py) pick each subreddit's tabs
+# and pacing from its page load latency and empty-post rate; when off,
+# every subreddit runs at the fixed tabs given to scrape_all_threads
+ADAPTIVE_RATE = True
+# with adaptive rate, posts are fetched in chunks of this many per tab so
+# a new tab count takes effect between chunks
+RATE_CHUNK_PER_TAB = 4
+
+REDDIT_BASE_URL = "https://www.reddit.com"
+
+# chrome is restarted after this many page loads or this much resident
+# memory (chromedriver + every chrome process under it), whichever is first
+RECYCLE_AFTER_PAGES = 150
+RECYCLE_AFTER_MB = 2500
+
+# ChromeDriverManager().install() does network version lookups, so the
+# driver path it returns is cached on disk and reused for a day
+CHROMEDRIVER_CACHE_PATH = "chromedriver_cache.json"
+CHROMEDRIVER_CACHE_MAX_AGE = 24 * 60 * 60  # s
+
+# "default": a visible, maximized chrome
+# "lean": headless, no extensions, images/media/fonts never downloaded
+SCRAPER_PROFILE = "default"
+
+# what the lean profile blocks through CDP. we only ever read text and
+# the avatar src attribute, so none of these need to be fetched
+BLOCKED_URL_PATTERNS = [
+    "*.jpg",
+    "*.jpeg",
+    "*.png",
+    "*.gif",
+    "*.webp",
+    "*.avif",
+    "*.svg",
+    "*.ico",
+    "*.mp4",
+    "*.webm",
+    "*.m3u8",
+    "*.ts",
+    "*.mp3",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+]
+
+# the lean profile's user agent: a regular desktop chrome instead of the
+# HeadlessChrome one reddit serves a degraded page to
+LEAN_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36"
+)
+
+# keeps a queue of listing post hrefs in the page as they get added, so
+# each scroll only hands back the new ones (anchor_mode="observer")
+INSTALL_ANCHOR_OBSERVER_SCRIPT = """
+if (!window.__sludgeAnchors) {
+    const selector = "a.absolute.inset-0";
+    const state = {queue: [], seen: new Set()};
+    const take = (anchor) => {
+        const href = anchor.href;
+        if (href && !state.seen.has(href)) {
+            state.seen.add(href);
+            state.queue.push(href);
+        }
+    };
+    document.querySelectorAll(selector).forEach(take);
+    state.observer = new MutationObserver((mutations) => {
+        for (const mutation of mutations) {
+            if (mutation.type === "attributes") {
+                if (mutation.target.matches(selector)) take(mutation.target);
+                continue;
+            }
+            for (const node of mutation.addedNodes) {
+                if (node.nodeType !== Node.ELEMENT_NODE) continue;
+                if (node.matches(selector)) take(node);
+                node.querySelectorAll(selector).forEach(take);
+            }
+        }
+    });
+    state.observer.observe(document.body, {
+        childList: true,
+        subtree: true,
+        attributes: true,
+        attributeFilter: ["href"],
+    });
+    window.__sludgeAnchors = state;
+}
+"""
+
+DRAIN_ANCHOR_OBSERVER_SCRIPT = """
+const state = window.__sludgeAnchors;
+if (!state) return null;
+const hrefs = state.queue;
+state.queue = [];
+return hrefs;
+"""
+
+# clicks "Read more" if the post has one; run before extracting in tabs
+# we cant afford to block on (get_posts_content_concurrent)
+EXPAND_READ_MORE_SCRIPT = """
+const readMore = Array.from(document.querySelectorAll("button")).find(
+    (button) => button.innerText.includes("Read more")
+);
+if (readMore) readMore.click();
+"""
+
+# fields get_post_content waits for, and where they live on a post page
+POST_CONTENT_FIELDS = {
+    "username": (By.CSS_SELECTOR, "a.author-name"),
+    "profile_img": (By.CSS_SELECTOR, "img.shreddit-subreddit-icon__icon"),
+    "content": (By.CSS_SELECTOR, "div.md"),
+    "title": (By.CSS_SELECTOR, "h1[id^='post-title-']"),
+}
+
+# pulls every post field in one webdriver round trip (extraction_mode="script")
+EXTRACT_POST_SCRIPT = """
+const text = (selector) => {
+    const el = document.querySelector(selector);
+    return el ? el.innerText : null;
+};
+const icon = document.querySelector("img.shreddit-subreddit-icon__icon");
+const path = window.location.pathname.split("/");
+return {
+    username: text("a.author-name"),
+    profile_img: icon ? icon.src : null,
+    content: text("div.md"),
+    title: text("h1[id^='post-title-']"),
+    thread_name: path[1] === "r" ? path[2] : null,
+    location: window.location.href,
+};
+"""
+
+# one poll of a tab in get_posts_content_concurrent: expand and extract.
+# read_more says the button was still there, so content is the collapsed
+# preview and has to wait for a later poll
+EXPAND_AND_EXTRACT_POST_SCRIPT = f"""
+{EXPAND_READ_MORE_SCRIPT}
+const post = (() => {{
+{EXTRACT_POST_SCRIPT}
+}})();
+post.read_more = Boolean(readMore);
+return post;
+"""
+
+
+def same_post(url_a, url_b):
+    post_id = post_id_from_url(url_a)
+    return post_id is not None and post_id == post_id_from_url(url_b)
+
 
 def decode_surrogates(s):
+    # posts that timed out on a field come through with None
+    if s is None:
+        return None
     return s.encode("utf-16", "surrogatepass").decode("utf-16")
 
 
@@ -34,20 +219,281 @@ class Post:
         }
 
 
+_chromedriver_path = None
+_chromedriver_lock = threading.Lock()
+
+
+def resolve_chromedriver_path():
+    """
+    Path to a chromedriver binary, resolved at most once per process and
+    once per day on disk. Falls back to a stale cached path when the
+    lookup fails, so a warm cache works without any network.
+    """
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path and os.path.exists(_chromedriver_path):
+            return _chromedriver_path
+
+        cached = None
+        if os.path.exists(CHROMEDRIVER_CACHE_PATH):
+            try:
+                with open(CHROMEDRIVER_CACHE_PATH, "r") as f:
+                    cached = json.load(f)
+                if not os.path.exists(cached["path"]):
+                    cached = None
+            except Exception:
+                cached = None
+
+        if cached and time.time() - cached["resolved_at"] < CHROMEDRIVER_CACHE_MAX_AGE:
+            _chromedriver_path = cached["path"]
+            return _chromedriver_path
+
+        try:
+            path = ChromeDriverManager().install()
+        except Exception as e:
+            if cached is None:
+                raise
+            print(f"[!] Could not refresh chromedriver ({e}), using the cached one")
+            _chromedriver_path = cached["path"]
+            return _chromedriver_path
+
+        with open(CHROMEDRIVER_CACHE_PATH, "w") as f:
+            json.dump({"path": path, "resolved_at": time.time()}, f, indent=4)
+        _chromedriver_path = path
+        return _chromedriver_path
+
+
+def forget_chromedriver_path(path):
+    """
+    Drop path from the cache, after Chrome refused to start with it (it
+    auto-updated past that driver). Another thread may have replaced it
+    already, then the newer path stays.
+    """
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path == path:
+            _chromedriver_path = None
+        try:
+            with open(CHROMEDRIVER_CACHE_PATH, "r") as f:
+                cached = json.load(f)
+            if cached["path"] == path:
+                os.remove(CHROMEDRIVER_CACHE_PATH)
+        except Exception:
+            pass
+
+
+def build_chrome_options(profile):
+    chrome_options = Options()
+    if profile == "lean":
+        chrome_options.add_argument("--headless=new")
+        # reddit serves a degraded page to HeadlessChrome user agents; set
+        # at launch, so every tab gets it
+        chrome_options.add_argument(f"--user-agent={LEAN_USER_AGENT}")
+        chrome_options.add_argument("--window-size=1920,1080")
+        chrome_options.add_argument("--disable-extensions")
+        chrome_options.add_argument("--mute-audio")
+        chrome_options.add_argument("--autoplay-policy=user-gesture-required")
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_experimental_option(
+            "prefs",
+            {
+                "profile.managed_default_content_settings.images": 2,
+                "profile.default_content_setting_values.notifications": 2,
+                "profile.default_content_setting_values.media_stream_mic": 2,
+                "profile.default_content_setting_values.media_stream_camera": 2,
+            },
+        )
+    elif profile == "default":
+        chrome_options.add_argument("--start-maximized")
+    else:
+        raise ValueError(f"Unknown scraper profile: {profile}")
+    return chrome_options
+
+
 class RedditScraper:
-    def __init__(self):
-        chrome_options = Options()
-        chrome_options.add_argument("--start-maximized ")
-        self.driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()), options=chrome_options
+    def __init__(
+        self,
+        extraction_mode="script",
+        profile=None,
+        recycle_after_pages=RECYCLE_AFTER_PAGES,
+        recycle_after_mb=RECYCLE_AFTER_MB,
+        saver=None,
+        base_url=None,
+        recorder=None,
+    ):
+        # base_url sends every page load somewhere other than reddit (a
+        # FixtureServer replaying recorded pages); links and stored urls
+        # keep the real reddit host either way.
+        # recorder is a PageRecorder that saves every page visited.
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.recorder = recorder
+
+        # "script": one execute_script call per poll returns every field
+        # "elements": one find_element call per field (the original path)
+        # "source": one page_source snapshot parsed with lxml, off the browser
+        self.extraction_mode = extraction_mode
+        self.profile = profile or SCRAPER_PROFILE
+        self.recycle_after_pages = recycle_after_pages
+        self.recycle_after_mb = recycle_after_mb
+        self.driver = None
+        self._start_driver()
+        self.saver = saver or DataSaver()
+        # per-phase durations of the last get_post_content call, in seconds
+        self.last_timings = {}
+
+    def _start_driver(self):
+        driver_path = resolve_chromedriver_path()
+        try:
+            self.driver = webdriver.Chrome(
+                service=Service(driver_path),
+                options=build_chrome_options(self.profile),
+            )
+        except SessionNotCreatedException as e:
+            print(f"[!] Chrome won't start with {driver_path} ({e.msg}), resolving it again")
+            forget_chromedriver_path(driver_path)
+            self.driver = webdriver.Chrome(
+                service=Service(resolve_chromedriver_path()),
+                options=build_chrome_options(self.profile),
+            )
+        if self.profile == "lean":
+            self._block_heavy_assets()
+        self.pages_served = 0
+
+    def site_url(self, url):
+        """The url to actually load for a reddit url."""
+        if self.base_url and url.startswith(REDDIT_BASE_URL):
+            return self.base_url + url[len(REDDIT_BASE_URL) :]
+        return url
+
+    def reddit_url(self, url):
+        """Undo site_url, for links read off a replayed page."""
+        if self.base_url and url.startswith(self.base_url):
+            return REDDIT_BASE_URL + url[len(self.base_url) :]
+        return url
+
+    def restart_driver(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+        self._start_driver()
+
+    def browser_memory_mb(self):
+        """Resident memory of chromedriver and every chrome process it started."""
+        try:
+            root = psutil.Process(self.driver.service.process.pid)
+            processes = [root] + root.children(recursive=True)
+        except Exception:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+
+    def maybe_recycle(self):
+        """Restart chrome if it has served too many pages or grown too big."""
+        reason = None
+        if self.pages_served >= self.recycle_after_pages:
+            reason = f"{self.pages_served} pages served"
+        # memory is only sampled every 10 pages, walking the process tree isnt free
+        elif self.pages_served and self.pages_served % 10 == 0:
+            memory_mb = self.browser_memory_mb()
+            if memory_mb is not None and memory_mb >= self.recycle_after_mb:
+                reason = f"{memory_mb:.0f}MB resident"
+        if reason is None:
+            return False
+        print(f"Recycling the browser ({reason})...")
+        self.restart_driver()
+        return True
+
+    def iter_post_contents(self, post_links, tabs=1):
+        """
+        Yield a Post for each link, recycling the browser between posts and
+        restarting it (then carrying on with the remaining links) if it crashes.
+        """
+        if self.extraction_mode == "source":
+            yield from self._iter_parsed_posts(post_links)
+            return
+
+        if tabs <= 1:
+            for post_link in post_links:
+                self.maybe_recycle()
+                try:
+                    yield self.get_post_content(post_link)
+                except WebDriverException as e:
+                    print(f"[!] Browser died on {post_link}, restarting it: {e}")
+                    self.restart_driver()
+            return
+
+        # tabs can only be recycled between batches
+        batch_size = max(tabs, self.recycle_after_pages)
+        for i in range(0, len(post_links), batch_size):
+            remaining = post_links[i : i + batch_size]
+            for attempt in range(2):
+                done = set()
+                try:
+                    for post in self.get_posts_content_concurrent(remaining, tabs):
+                        done.add(post.url)
+                        yield post
+                    break
+                except WebDriverException as e:
+                    print(f"[!] Browser died mid-batch, restarting it: {e}")
+                    self.restart_driver()
+                    remaining = [link for link in remaining if link not in done]
+            self.maybe_recycle()
+
+    def _block_heavy_assets(self):
+        # for the current tab only
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        self.driver.execute_cdp_cmd(
+            "Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS}
         )
-        self.saver = DataSaver()
 
-    def get_posts(self, thread_link, max_posts=50, scroll_pause=0.2, max_scrolls=200):
-        self.driver.get(thread_link)
-        time.sleep(5)
+    def get_posts(
+        self,
+        thread_link,
+        max_posts=50,
+        scroll_pause=0.2,
+        max_scrolls=200,
+        load_timeout=15,
+        scroll_timeout=3,
+        incremental=False,
+        known_streak_limit=25,
+        anchor_mode="observer",
+    ):
+        # incremental crawls read the /new/ listing, where everything past
+        # the last crawl's newest post (the high-water mark) is already known
+        crawl_state = CrawlState() if incremental else None
+        if incremental:
+            high_water_mark = crawl_state.get_high_water_mark(thread_link)
+            # a link that already points at /new/ is left as it is
+            if not thread_link.rstrip("/").endswith("/new"):
+                thread_link = thread_link.rstrip("/") + "/new/"
+
+        load_start_time = time.time()
+        self.driver.get(self.site_url(thread_link))
+        self.pages_served += 1
+        try:
+            WebDriverWait(self.driver, load_timeout).until(
+                EC.presence_of_element_located(
+                    (By.CSS_SELECTOR, "a.absolute.inset-0")
+                )
+            )
+        except TimeoutException:
+            print(f"[!] No post links showed up on {thread_link}")
+        print(f"Listing loaded in {time.time() - load_start_time:.2f}s")
+        if anchor_mode == "observer":
+            self.driver.execute_script(INSTALL_ANCHOR_OBSERVER_SCRIPT)
 
-        post_links = set()
+        post_links = {}
+        seen_links = set()
+        newest_link = None
+        known_streak = 0
+        caught_up = False
+        exhausted = False
         scrolls = 0
 
         last_height = self.driver.execute_script("return document.body.scrollHeight")
@@ -57,29 +503,81 @@ class RedditScraper:
             self.driver.execute_script(
                 "window.scrollTo(0, document.body.scrollHeight);"
             )
-            time.sleep(scroll_pause)
+
+            # wait for the next page of posts to load in, if there is one
+            try:
+                WebDriverWait(
+                    self.driver, scroll_timeout, poll_frequency=scroll_pause
+                ).until(
+                    lambda d: d.execute_script("return document.body.scrollHeight")
+                    > last_height
+                )
+            except TimeoutException:
+                pass
 
             # Look for new posts
-            posts = self.driver.find_elements(By.CSS_SELECTOR, "a.absolute.inset-0")
-            for post in posts:
-                href = post.get_attribute("href")
-                if href and "/comments/" in href:
-                    if self.saver.data_exists(href):
-                        # print(f"Post {href} already exists, skipping...")
-                        continue
-                    post_links.add(href)
+            for href in self._new_listing_hrefs(anchor_mode, seen_links):
+                if "/comments/" not in href:
+                    continue
+                seen_links.add(href)
+                if newest_link is None:
+                    newest_link = href
+
+                if self.saver.data_exists(href):
+                    # print(f"Post {href} already exists, skipping...")
+                    known_streak += 1
+                else:
+                    known_streak = 0
+                    post_links[href] = None
+
+                if incremental and (
+                    same_post(href, high_water_mark)
+                    or known_streak >= known_streak_limit
+                ):
+                    caught_up = True
+                    break
+
+            if caught_up:
+                print(f"Caught up with the last crawl of {thread_link}")
+                break
 
             # Check if the scroll did anything
             new_height = self.driver.execute_script("return document.body.scrollHeight")
             if new_height == last_height:
+                exhausted = True
                 break  # No more content
             last_height = new_height
             scrolls += 1
             print(f"Scroll {scrolls}, collected {len(post_links)} links")
 
+        # a crawl cut short (max_posts, max_scrolls) left posts between the
+        # old mark and where it stopped, so the mark stays put until a crawl
+        # actually gets back to it
+        if incremental and newest_link is not None and (caught_up or exhausted):
+            crawl_state.set_high_water_mark(thread_link, newest_link)
+        if self.recorder is not None:
+            self.recorder.record_listing(thread_link, self.driver.page_source)
+
         print(f"Scraped a total of {len(post_links)} post links.")
         return list(post_links)
 
+    def _new_listing_hrefs(self, anchor_mode, seen_links):
+        """Listing hrefs not in seen_links, in page order."""
+        if anchor_mode == "observer":
+            hrefs = self.driver.execute_script(DRAIN_ANCHOR_OBSERVER_SCRIPT)
+            if hrefs is None:
+                # the page reloaded under us, start watching again
+                self.driver.execute_script(INSTALL_ANCHOR_OBSERVER_SCRIPT)
+                hrefs = self.driver.execute_script(DRAIN_ANCHOR_OBSERVER_SCRIPT)
+        else:
+            # "scan": re-read every anchor on the page, quadratic over a deep scroll
+            posts = self.driver.find_elements(By.CSS_SELECTOR, "a.absolute.inset-0")
+            hrefs = [post.get_attribute("href") for post in posts]
+        # one url per post, so slug or query variations of a link seen
+        # earlier in the listing dont count as new posts
+        hrefs = [canonical_post_url(self.reddit_url(href)) for href in hrefs if href]
+        return list(dict.fromkeys(href for href in hrefs if href not in seen_links))
+
     def url2thread_name(self, url):
         # https://www.reddit.com/r/AmItheAsshole/comments/1lu69qb/aita_for_pulling_my_daughter_from_soccer_camp_and/
         # extract the AmItheAsshole part
@@ -91,170 +589,728 @@ class RedditScraper:
 
         return None
 
-    def get_post_content(self, post_link):
-        print("Starting to scrape post:", post_link)
-        scrape_start_time = time.time()
+    def _load_post_page(self, post_link, timings, timeout):
+        """Navigate to a post, wait for it to render and expand "Read more"."""
         print("Getting to page...")
-        self.driver.get(post_link)
-        time.sleep(5)
+        phase_start_time = time.time()
+        self.driver.get(self.site_url(post_link))
+        self.pages_served += 1
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(
+                EC.presence_of_element_located(
+                    (By.CSS_SELECTOR, "h1[id^='post-title-']")
+                )
+            )
+        except TimeoutException:
+            print(f"[!] Post title never showed up on {post_link}")
+        timings["load"] = time.time() - phase_start_time
 
+        phase_start_time = time.time()
         try:
             read_more_button = self.driver.find_element(
                 By.XPATH, "//button[contains(., 'Read more')]"
             )
             read_more_button.click()
-            time.sleep(1)  # Let the content expand
+            # the button goes away once the content has expanded
+            WebDriverWait(self.driver, 2, poll_frequency=0.1).until(
+                EC.invisibility_of_element(read_more_button)
+            )
         except:
             pass
+        timings["expand"] = time.time() - phase_start_time
 
-        # repeatedly scrape content until we get all necessary data
-        timeout = 10  # s
-        username, profile_img, content, title = None, None, None, None
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                if username is None:
-                    username = self.driver.find_element(
-                        By.CSS_SELECTOR, "a.author-name"
-                    ).text
-            except:
-                pass
+        if self.recorder is not None:
+            self.recorder.record_post(post_link, self.driver.page_source)
+
+    def get_post_content(self, post_link, timeout=10):
+        print("Starting to scrape post:", post_link)
+        scrape_start_time = time.time()
+        timings = {}
+        wait = WebDriverWait(self.driver, timeout, poll_frequency=0.1)
+        self._load_post_page(post_link, timings, timeout)
+
+        # poll until every field is in the DOM or we time out
+        phase_start_time = time.time()
+        found = {}
+        if self.extraction_mode == "script":
+            extract_fields = self._extract_fields_with_script
+        elif self.extraction_mode == "source":
+            extract_fields = self._extract_fields_from_source
+        else:
+            extract_fields = self._extract_fields_with_elements
+
+        try:
+            wait.until(lambda driver: extract_fields(found))
+        except TimeoutException:
+            missing = [name for name in POST_CONTENT_FIELDS if name not in found]
+            print(f"[!] Missing {missing} on {post_link}")
+        timings["extract"] = time.time() - phase_start_time
+
+        post = self._build_post(post_link, found)
+        timings["total"] = time.time() - scrape_start_time
+        self.last_timings = timings
+        print(
+            f"Scraped {post_link} in {timings['total']:.2f}s! "
+            + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items() if k != "total")
+        )
+        return post
+
+    def get_posts_content_concurrent(self, post_links, tabs=4, timeout=20):
+        """
+        Scrape post_links over several tabs of this one browser, yielding
+        Posts as they finish. Navigation is fired without waiting, so the
+        page loads of up to `tabs` posts overlap.
+        """
+        main_handle = self.driver.current_window_handle
+        handles = [main_handle]
+        for _ in range(min(tabs, len(post_links)) - 1):
+            self.driver.switch_to.new_window("tab")
+            handles.append(self.driver.current_window_handle)
+            if self.profile == "lean":
+                # cdp settings only apply to the tab they were sent to
+                self._block_heavy_assets()
+
+        pending = list(post_links)
+        # handle -> (post_link, started_at, found fields)
+        in_flight = {}
+        # handle -> content read while "Read more" was still showing
+        collapsed = {}
+
+        def start_next(handle):
+            post_link = pending.pop(0)
+            self.driver.switch_to.window(handle)
+            # returns right away, unlike driver.get
+            self.driver.execute_script(
+                "window.location.href = arguments[0];", self.site_url(post_link)
+            )
+            self.pages_served += 1
+            in_flight[handle] = (post_link, time.time(), {})
+
+        try:
+            for handle in handles:
+                if pending:
+                    start_next(handle)
+
+            while in_flight:
+                for handle in list(in_flight):
+                    post_link, started_at, found = in_flight[handle]
+                    self.driver.switch_to.window(handle)
+                    try:
+                        result = self.driver.execute_script(
+                            EXPAND_AND_EXTRACT_POST_SCRIPT
+                        )
+                    except:
+                        result = None
 
+                    # until the navigation commits the tab still shows the last post
+                    if result and same_post(result["location"], post_link):
+                        for name, value in result.items():
+                            if name not in POST_CONTENT_FIELDS or value is None:
+                                continue
+                            if name == "content" and result["read_more"]:
+                                # just clicked, the full text shows up next poll
+                                collapsed[handle] = value
+                                continue
+                            found.setdefault(name, value)
+
+                    done = all(name in found for name in POST_CONTENT_FIELDS)
+                    timed_out = time.time() - started_at > timeout
+                    if not (done or timed_out):
+                        continue
+
+                    if "content" not in found and handle in collapsed:
+                        # "Read more" never went away, the preview beats nothing
+                        found["content"] = collapsed[handle]
+                    collapsed.pop(handle, None)
+                    done = all(name in found for name in POST_CONTENT_FIELDS)
+                    if timed_out and not done:
+                        missing = [n for n in POST_CONTENT_FIELDS if n not in found]
+                        print(f"[!] Missing {missing} on {post_link}")
+                    if self.recorder is not None:
+                        self.recorder.record_post(post_link, self.driver.page_source)
+                    del in_flight[handle]
+                    if pending:
+                        start_next(handle)
+                    self.last_timings = {"total": time.time() - started_at}
+                    print(f"Scraped {post_link} in {self.last_timings['total']:.2f}s!")
+                    yield self._build_post(post_link, found)
+
+                time.sleep(0.1)
+        finally:
+            for handle in handles[1:]:
+                try:
+                    self.driver.switch_to.window(handle)
+                    self.driver.close()
+                except:
+                    pass
+            self.driver.switch_to.window(main_handle)
+
+    def _build_post(self, post_link, found):
+        return Post(
+            username=found.get("username"),
+            profile_img=found.get("profile_img"),
+            content=found.get("content"),
+            thread_name=self.url2thread_name(post_link) or found.get("thread_name"),
+            title=found.get("title"),
+            url=post_link,
+        )
+
+    def _extract_fields_with_elements(self, found):
+        """Fill in missing fields with one find_element per field."""
+        for name, locator in POST_CONTENT_FIELDS.items():
+            if name in found:
+                continue
             try:
-                if profile_img is None:
-                    profile_img = self.driver.find_element(
-                        By.CSS_SELECTOR, "img.shreddit-subreddit-icon__icon"
-                    )
+                element = self.driver.find_element(*locator)
             except:
-                pass
+                continue
+            if name == "profile_img":
+                found[name] = element.get_attribute("src")
+            else:
+                found[name] = element.text
+        return len(found) == len(POST_CONTENT_FIELDS)
+
+    def _extract_fields_from_source(self, found):
+        """Fill in missing fields by parsing one page_source snapshot with lxml."""
+        for name, value in parse_post_html(self.driver.page_source).items():
+            found.setdefault(name, value)
+        return all(name in found for name in POST_CONTENT_FIELDS)
+
+    def get_post_source(self, post_link, timeout=10):
+        """Load a post and hand back its html, leaving the parsing to the caller."""
+        timings = {}
+        scrape_start_time = time.time()
+        self._load_post_page(post_link, timings, timeout)
 
+        # the title renders before the rest of the post, so hold the
+        # snapshot until every field is in the DOM or we time out
+        phase_start_time = time.time()
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(
+                lambda driver: all(
+                    driver.find_elements(*locator)
+                    for locator in POST_CONTENT_FIELDS.values()
+                )
+            )
+        except TimeoutException:
+            pass
+        timings["wait"] = time.time() - phase_start_time
+
+        phase_start_time = time.time()
+        page_source = self.driver.page_source
+        timings["snapshot"] = time.time() - phase_start_time
+        timings["total"] = time.time() - scrape_start_time
+        self.last_timings = timings
+        return page_source
+
+    def _iter_parsed_posts(self, post_links):
+        """
+        extraction_mode="source" pipeline: the browser only loads pages and
+        snapshots their html, the parser pool turns them into Posts while
+        the browser is already on the next link.
+        """
+        parser_pool = get_parser_pool()
+        parsing = deque()
+
+        def finish(post_link, future):
             try:
-                if content is None:
-                    content = self.driver.find_element(By.CSS_SELECTOR, "div.md").text
-            except:
-                pass
+                found = future.result()
+            except Exception as e:
+                print(f"[!] Failed to parse {post_link}: {e}")
+                found = {}
+            missing = [name for name in POST_CONTENT_FIELDS if name not in found]
+            if missing:
+                print(f"[!] Missing {missing} on {post_link}")
+            return self._build_post(post_link, found)
 
+        for post_link in post_links:
+            self.maybe_recycle()
             try:
-                if title is None:
-                    title = self.driver.find_element(
-                        By.CSS_SELECTOR, "h1[id^='post-title-']"
-                    ).text
-            except:
-                pass
+                page_source = self.get_post_source(post_link)
+            except WebDriverException as e:
+                print(f"[!] Browser died on {post_link}, restarting it: {e}")
+                self.restart_driver()
+                continue
+            parsing.append((post_link, parser_pool.submit(parse_post_html, page_source)))
+            print(f"Loaded {post_link} in {self.last_timings['total']:.2f}s, parsing...")
 
-            # if all data exists break
-            if None not in (username, profile_img, content, title):
-                break
+            while parsing and parsing[0][1].done():
+                yield finish(*parsing.popleft())
 
-        post = Post(
-            username=username,
-            profile_img=profile_img.get_attribute("src") if profile_img else None,
-            content=content,
-            thread_name=self.url2thread_name(post_link),
-            title=title,
-            url=post_link,
-        )
-        print(f"Scraped {post_link} in {time.time() - scrape_start_time:.2f}s!")
-        return post
+        while parsing:
+            yield finish(*parsing.popleft())
+
+    def _extract_fields_with_script(self, found):
+        """Fill in missing fields with a single execute_script round trip."""
+        try:
+            result = self.driver.execute_script(EXTRACT_POST_SCRIPT)
+        except:
+            return False
+        for name, value in result.items():
+            if name == "location":
+                continue
+            if value is not None and name not in found:
+                found[name] = value
+        return all(name in found for name in POST_CONTENT_FIELDS)
+
+
+class CrawlState:
+    """
+    Per-subreddit high-water marks for incremental crawls: the newest post
+    link seen on the /new/ listing the last time each subreddit was crawled.
+    """
+
+    lock = threading.Lock()
+
+    def __init__(self, fp="crawl_state.json"):
+        self.fp = fp
+
+    def _load(self):
+        if not os.path.exists(self.fp):
+            return {}
+        with open(self.fp, "r") as f:
+            return json.load(f)
+
+    def _key(self, thread_link):
+        # /r/tifu/ and /r/tifu/new/ are the same subreddit
+        return thread_link.split("/r/")[-1].split("/")[0].lower()
+
+    def get_high_water_mark(self, thread_link):
+        with self.lock:
+            state = self._load().get(self._key(thread_link), {})
+        return state.get("high_water_mark")
+
+    def set_high_water_mark(self, thread_link, post_link):
+        with self.lock:
+            state = self._load()
+            state[self._key(thread_link)] = {
+                "high_water_mark": post_link,
+                "last_crawl": time.time(),
+            }
+            # write then swap so a crash never leaves a half written file
+            temp_fp = f"{self.fp}.tmp"
+            with open(temp_fp, "w") as f:
+                json.dump(state, f, indent=4)
+            os.replace(temp_fp, self.fp)
 
 
 class DataSaver:
-    def __init__(self):
-        self.data_folder_path = "reddit_data"
-        if not os.path.exists(self.data_folder_path):
-            os.makedirs(self.data_folder_path)
+    def __init__(self, backend=None, root="."):
+        # root moves the whole corpus (folder, index and store), which
+        # benchmarks use to stay out of the real reddit_data/
+        self.backend = backend or DATA_BACKEND
+        self.data_folder_path = os.path.join(root, "reddit_data")
         self.file_count = None
 
+        if self.backend == "folder":
+            if not os.path.exists(self.data_folder_path):
+                os.makedirs(self.data_folder_path)
+            self.index = PostIndex(
+                self.data_folder_path,
+                db_path=os.path.join(root, "reddit_url_index.sqlite"),
+            )
+        elif self.backend == "sqlite":
+            os.makedirs(root, exist_ok=True)
+            self.store = PostStore(os.path.join(root, "reddit_corpus.sqlite"))
+        elif self.backend == "pack":
+            self.pack = CorpusPack(os.path.join(root, "reddit_corpus.pack"))
+        else:
+            raise ValueError(f"Unknown DataSaver backend: {self.backend}")
+
+        self.fingerprints = FingerprintIndex(
+            os.path.join(root, "reddit_fingerprints.sqlite")
+        )
+        # fingerprinting an existing corpus takes minutes, so it runs in the
+        # background; until it is done near-duplicate checks only see the
+        # posts fingerprinted so far
+        self.fingerprints_ready = threading.Event()
+        if self.fingerprints.needs_build():
+            threading.Thread(
+                target=self._build_fingerprints,
+                name="fingerprint-build",
+                daemon=True,
+            ).start()
+        else:
+            self.fingerprints_ready.set()
+
+        # every saved post id, so listing scans can rule out new posts
+        # without touching the index on disk
+        if self.backend == "sqlite":
+            post_ids = self.store.post_ids()
+        elif self.backend == "pack":
+            post_ids = self.pack.post_ids()
+        else:
+            post_ids = self.index.post_ids()
+        self.known_ids = BloomFilter(capacity=max(2 * len(post_ids), 100_000))
+        self.known_ids.update(post_ids)
+        # near-duplicates that were skipped rather than saved count as seen
+        self.known_ids.update(map(post_id_from_url, self.fingerprints.flagged_urls()))
+
+    def _build_fingerprints(self):
+        # daemon thread: batches are committed as they go, so a build cut
+        # short by exit resumes on the next start
+        try:
+            self.fingerprints.build(self._iter_post_dicts())
+        except Exception as e:
+            print(f"[!] Fingerprinting the corpus failed, will retry next start: {e}")
+            return
+        self.fingerprints_ready.set()
+
+    def _is_stored(self, post_url):
+        if self.backend == "sqlite":
+            return self.store.contains(post_url)
+        if self.backend == "pack":
+            return self.pack.find(post_url) is not None
+        return self.index.contains(post_url)
+
     def data_exists(self, post_url):
-        files = os.listdir(self.data_folder_path)
-        self.file_count = len(files)
-        for f in files:
-            if ".json" in f:
-                with open(os.path.join(self.data_folder_path, f), "r") as file:
-                    data = json.load(file)
-                    if data.get("url") == post_url:
-                        return True
-        return False
-
-    def save_post_data(self, post: Post):
+        """
+        Whether the post was already saved. Posts missing from the bloom
+        filter are new without a disk lookup; everything else is confirmed
+        against the index. Posts another process saved since this DataSaver
+        was created read as new here, but save_post_data still skips them.
+        """
+        post_id = post_id_from_url(post_url)
+        if post_id is not None and post_id not in self.known_ids:
+            return False
+        return self._is_stored(post_url) or self._is_skipped(post_url)
+
+    def _is_skipped(self, post_url):
+        # near-duplicates skipped by save_post_data are only fingerprinted
+        return self.fingerprints.contains(canonical_post_url(post_url))
+
+    def count(self):
+        if self.backend == "sqlite":
+            return self.store.count()
+        if self.backend == "pack":
+            return len(self.pack)
+        return self.index.count()
+
+    def save_post_data(self, post: Post, near_duplicates=None):
+        """Save post unless it is already saved (or skipped); True if it was written."""
+        if self.backend == "pack":
+            raise ValueError("A packed corpus is read only, scrape into folder or sqlite")
+        near_duplicates = near_duplicates or NEAR_DUPLICATE_POLICY
+
         # clean the post content before it gets written
         post.content = decode_surrogates(post.content)
         post.title = decode_surrogates(post.title)
 
-        # check if already exists
+        # check if already exists, always on disk since other processes
+        # may be saving into the same corpus
+        post.url = canonical_post_url(post.url)
         url = post.url
-        if self.data_exists(url):
+        if self._is_stored(url) or self._is_skipped(url):
             # print(f"Post {url} already exists, skipping save.")
-            return
+            return False
 
+        # reposts and crossposts of the same story under another url
         data = post.to_dict()
-        # make a uuid for this file name
-        file_name = (
-            "".join(random.choices("abcdefghijklmnopqrstuvwxyz0123456789", k=20))
-            + ".json"
-        )
-        file_path = os.path.join(self.data_folder_path, file_name)
-        with open(file_path, "w") as f:
-            json.dump(data, f, indent=4)
+        fingerprint = minhash(post_text(data))
+        duplicate_of = None
+        # while the background build runs a miss here is not conclusive;
+        # the build flags the pair once it reaches the older post
+        if near_duplicates != "off":
+            duplicate_of = self.fingerprints.find_near_duplicate(
+                fingerprint, exclude_url=url
+            )
+        if duplicate_of is not None:
+            if near_duplicates == "skip":
+                print(f"Skipping {url}, it is a near duplicate of {duplicate_of}")
+                # remembered as seen, so later crawls don't fetch it again
+                self.fingerprints.add(url, fingerprint, duplicate_of)
+                if post_id_from_url(url) is not None:
+                    self.known_ids.add(post_id_from_url(url))
+                return False
+            print(f"Flagging {url} as a near duplicate of {duplicate_of}")
+
+        if self.backend == "sqlite":
+            self.store.add(data)
+        else:
+            # make a uuid for this file name
+            file_name = (
+                "".join(random.choices("abcdefghijklmnopqrstuvwxyz0123456789", k=20))
+                + ".json"
+            )
+            file_path = os.path.join(self.data_folder_path, file_name)
+            with open(file_path, "w") as f:
+                json.dump(data, f, indent=4)
+            self.index.add(file_name, data)
+        self.fingerprints.add(url, fingerprint, duplicate_of)
+        if post_id_from_url(url) is not None:
+            self.known_ids.add(post_id_from_url(url))
+        self.file_count = self.count()
         print(f"Saved this post data. There are now ~{self.file_count} posts saved!")
+        return True
 
-    def get_all_posts(self):
-        posts = []
-        file_names = os.listdir(self.data_folder_path)
-        for file_name in file_names:
+    def _iter_post_dicts(self):
+        if self.backend == "sqlite":
+            yield from self.store.iter_posts()
+            return
+        if self.backend == "pack":
+            yield from self.pack.iter_posts()
+            return
+
+        for file_name in os.listdir(self.data_folder_path):
             if file_name.endswith(".json"):
                 file_path = os.path.join(self.data_folder_path, file_name)
-                with open(file_path, "r") as f:
-                    data = json.load(f)
-                    post = Post(
-                        data["username"],
-                        data["profile_img"],
-                        data["content"],
-                        data["thread_name"],
-                        data["title"],
-                        data["url"],
-                    )
-                    posts.append(post)
-                    print(f"Loaded post {len(posts)} / {len(file_names)}", end="\r")
+                # a file another saver is still writing, or a broken one
+                try:
+                    with open(file_path, "r") as f:
+                        data = json.load(f)
+                except Exception as e:
+                    print(f"[!] Could not read post file {file_path}: {e}")
+                    continue
+                yield data
+
+    def iter_posts(self):
+        for data in self._iter_post_dicts():
+            yield Post(
+                data["username"],
+                data["profile_img"],
+                data["content"],
+                data["thread_name"],
+                data["title"],
+                data["url"],
+            )
+
+    def query_posts(self, exclude_urls=(), limit=None, **criteria):
+        """
+        Yield unused posts matching the eligibility criteria, in random order.
+        criteria are min_content_len, max_content_len, max_thread_len and
+        max_username_len. Posts are loaded lazily, one per candidate consumed.
+        """
+        # flagged near-duplicates are kept, but never used
+        exclude_urls = set(exclude_urls) | self.fingerprints.flagged_urls()
+        if self.backend == "sqlite":
+            candidates = [
+                url for url in self.store.query_urls(**criteria)
+                if url not in exclude_urls
+            ]
+        elif self.backend == "pack":
+            # selection reads only the pack's records and urls
+            candidates = [
+                i for i in self.pack.query(**criteria)
+                if self.pack.url(i) not in exclude_urls
+            ]
+        else:
+            candidates = [
+                (url, file_name) for url, file_name in self.index.query(**criteria)
+                if url not in exclude_urls
+            ]
+        random.shuffle(candidates)
+        if limit is not None:
+            candidates = candidates[:limit]
+
+        for candidate in candidates:
+            if self.backend == "sqlite":
+                data = self.store.get_post(candidate)
+            elif self.backend == "pack":
+                data = self.pack.get_post(candidate)
+            else:
+                file_path = os.path.join(self.data_folder_path, candidate[1])
+                try:
+                    with open(file_path, "r") as f:
+                        data = json.load(f)
+                except Exception:
+                    data = None
+            if data is None:
+                continue
+            yield Post(
+                data["username"],
+                data["profile_img"],
+                data["content"],
+                data["thread_name"],
+                data["title"],
+                data["url"],
+            )
+
+    def get_all_posts(self):
+        posts = []
+        total = self.count()
+        for post in self.iter_posts():
+            posts.append(post)
+            print(f"Loaded post {len(posts)} / {total}", end="\r")
         return posts
 
 
-def scrape_thread(thread_url, posts_to_scrape: int, stop_flag):
+class BrowserPool:
+    """
+    Bounded set of RedditScraper browsers shared by subreddit jobs.
+    Browsers are started lazily, up to size, and reused after release.
+    """
+
+    def __init__(self, size=BROWSER_POOL_SIZE, **scraper_kwargs):
+        self.size = size
+        self.scraper_kwargs = scraper_kwargs
+        self.available = queue.Queue()
+        self.all_scrapers = []
+        self.started = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self.available.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            # reserve the slot before the (slow) browser launch
+            can_start = self.started < self.size
+            if can_start:
+                self.started += 1
+        if not can_start:
+            return self.available.get()
+
+        try:
+            scraper = RedditScraper(**self.scraper_kwargs)
+        except Exception:
+            with self.lock:
+                self.started -= 1
+            raise
+        with self.lock:
+            self.all_scrapers.append(scraper)
+        return scraper
+
+    def release(self, scraper):
+        self.available.put(scraper)
+
+    def close(self):
+        with self.lock:
+            scrapers = self.all_scrapers
+            self.all_scrapers = []
+        for scraper in scrapers:
+            try:
+                scraper.driver.quit()
+            except Exception:
+                pass
+
+
+def scrape_thread(
+    thread_url,
+    posts_to_scrape: int,
+    stop_flag,
+    pool=None,
+    incremental=False,
+    tabs=1,
+    rate_controller=None,
+):
     posts_scraped = 0
-    scraper = RedditScraper()
-    data_saver = DataSaver()
+    posts = None
+    scraper = pool.acquire() if pool is not None else RedditScraper()
+    data_saver = scraper.saver
+    rate_name = scraper.url2thread_name(thread_url) or thread_url
 
     try:
-        post_links = scraper.get_posts(thread_url, max_posts=posts_to_scrape)[
-            :posts_to_scrape
-        ]
+        scroll_pause = 0.2
+        if rate_controller is not None:
+            scroll_pause = rate_controller.scroll_pause(rate_name)
+        post_links = scraper.get_posts(
+            thread_url,
+            max_posts=posts_to_scrape,
+            incremental=incremental,
+            scroll_pause=scroll_pause,
+        )[:posts_to_scrape]
         random.shuffle(post_links)
 
-        for post_link in post_links:
-            if stop_flag.is_set():
-                print(f"[!] Stopping thread for {thread_url}")
-                break
-            if posts_scraped >= posts_to_scrape:
-                break
-            post = scraper.get_post_content(post_link)
-            data_saver.save_post_data(post)
-            posts_scraped += 1
+        while post_links and posts_scraped < posts_to_scrape:
+            # the controller may change the tab count between chunks
+            if rate_controller is not None:
+                chunk_tabs = rate_controller.tabs(rate_name)
+                chunk_size = chunk_tabs * RATE_CHUNK_PER_TAB
+            else:
+                chunk_tabs, chunk_size = tabs, len(post_links)
+            chunk, post_links = post_links[:chunk_size], post_links[chunk_size:]
+
+            posts = scraper.iter_post_contents(chunk, tabs=chunk_tabs)
+            for post in posts:
+                if stop_flag.is_set():
+                    print(f"[!] Stopping thread for {thread_url}")
+                    return
+                if posts_scraped >= posts_to_scrape:
+                    break
+                data_saver.save_post_data(post)
+                posts_scraped += 1
+
+                if rate_controller is not None:
+                    timings = scraper.last_timings
+                    rate_controller.record(
+                        rate_name,
+                        timings.get("load", timings.get("total")),
+                        ok=post.content is not None and post.title is not None,
+                    )
+                    # holds back the next page load, not just the next save
+                    rate_controller.wait(rate_name)
+            posts.close()
+            posts = None
 
     except Exception as e:
         print(f"Error scraping thread {thread_url}: {e}")
+        if rate_controller is not None:
+            rate_controller.record(rate_name, ok=False)
+
+    finally:
+        # close the extra tabs before anyone else can borrow this browser
+        if posts is not None:
+            posts.close()
+        if pool is not None:
+            pool.release(scraper)
+
+
+def scrape_all_threads(
+    threads_to_scrape,
+    posts_to_scrape: int,
+    stop_flag,
+    pool_size=BROWSER_POOL_SIZE,
+    incremental=False,
+    tabs=1,
+    adaptive=None,
+):
+    # subreddits wait in a queue, and at most pool_size of them are
+    # scraped at once, each on a browser borrowed from the pool
+    jobs = queue.Queue()
+    for thread in dict.fromkeys(threads_to_scrape):
+        jobs.put(thread)
+
+    pool = BrowserPool(pool_size)
+    adaptive = ADAPTIVE_RATE if adaptive is None else adaptive
+    rate_controller = RateController(initial_tabs=tabs) if adaptive else None
 
+    def worker():
+        while not stop_flag.is_set():
+            try:
+                thread = jobs.get_nowait()
+            except queue.Empty:
+                break
+            scrape_thread(
+                thread,
+                posts_to_scrape,
+                stop_flag,
+                pool,
+                incremental,
+                tabs,
+                rate_controller,
+            )
 
-def scrape_all_threads(threads_to_scrape, posts_to_scrape: int, stop_flag):
     threads = []
-    for thread in threads_to_scrape:
+    for _ in range(min(pool_size, jobs.qsize())):
         try:
-            t = threading.Thread(
-                target=scrape_thread, args=(thread, posts_to_scrape, stop_flag)
-            )
+            t = threading.Thread(target=worker)
             t.start()
             threads.append(t)
         except Exception as e:
-            print(f"[!] Failed to start thread for {thread}: {e}")
+            print(f"[!] Failed to start scrape worker: {e}")
+
+    def close_pool_when_done():
+        for t in threads:
+            t.join()
+        pool.close()
+        if rate_controller is not None:
+            rate_controller.summary()
+
+    # not a daemon: the interpreter has to wait for it to quit the
+    # browsers, or chrome and chromedriver outlive the script
+    threading.Thread(target=close_pool_when_done, name="browser-pool-closer").start()
     return threads
 
 
@@ -272,4 +1328,4 @@ if __name__ == "__main__":
         "https://www.reddit.com/r/karen/",
         "https://www.reddit.com/r/TalesFromRetail/",
     ]
-    scrape_all_threads(threads_to_scrape, 500)
+    scrape_all_threads(threads_to_scrape, 500, threading.Event())
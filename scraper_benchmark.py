@@ -0,0 +1,272 @@
+import argparse
+import os
+import queue
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from fixture_server import FixtureServer
+from page_recorder import PageRecorder
+from post_ids import post_id_from_url
+from post_parser import parse_post_html, get_parser_pool, PARSER_WORKERS
+from scraper import RedditScraper, BrowserPool, DataSaver
+
+
+def summarize(label, samples):
+    if not samples:
+        print(f"{label}: no samples")
+        return
+    print(
+        f"{label}: mean {statistics.mean(samples):.3f}s | "
+        f"median {statistics.median(samples):.3f}s | "
+        f"max {max(samples):.3f}s | n={len(samples)}"
+    )
+
+
+def benchmark_extraction_modes(post_links, modes=("elements", "script", "source")):
+    """
+    Scrape the same posts once per extraction mode and report per-post
+    latency. Every mode visits the links in the same order on one browser
+    so the only difference is how the fields get pulled out of the page.
+    """
+    scraper = RedditScraper()
+    results = {}
+    try:
+        # warm the browser cache so the first mode isnt penalized
+        for post_link in post_links:
+            scraper.driver.get(post_link)
+
+        for mode in modes:
+            scraper.extraction_mode = mode
+            extract_times, total_times = [], []
+            for post_link in post_links:
+                scraper.get_post_content(post_link)
+                extract_times.append(scraper.last_timings["extract"])
+                total_times.append(scraper.last_timings["total"])
+            results[mode] = {"extract": extract_times, "total": total_times}
+    finally:
+        scraper.driver.quit()
+
+    print("\n--- extraction benchmark ---")
+    for mode, timings in results.items():
+        summarize(f"[{mode}] extract", timings["extract"])
+        summarize(f"[{mode}] per post", timings["total"])
+    return results
+
+
+def benchmark_parser(fixtures_dir, workers=None, repeat=5):
+    """
+    Parse throughput of recorded post pages alone, no browser involved:
+    once inline and once across the parser thread pool.
+    """
+    pages = []
+    for file_name in sorted(os.listdir(fixtures_dir)):
+        if file_name.endswith(".html"):
+            file_path = os.path.join(fixtures_dir, file_name)
+            with open(file_path, "r", encoding="utf-8") as f:
+                pages.append(f.read())
+    if not pages:
+        print(f"[!] No .html fixtures in {fixtures_dir}")
+        return None
+    pages = pages * repeat
+
+    start_time = time.time()
+    for page in pages:
+        parse_post_html(page)
+    inline_rate = len(pages) / (time.time() - start_time)
+
+    parser_pool = get_parser_pool(workers)
+    # spin the workers up before timing
+    list(parser_pool.map(parse_post_html, pages[:1]))
+    start_time = time.time()
+    list(parser_pool.map(parse_post_html, pages))
+    pool_rate = len(pages) / (time.time() - start_time)
+
+    print("\n--- parser benchmark ---")
+    print(f"{len(pages)} pages ({len(pages) // repeat} fixtures x {repeat})")
+    print(f"inline: {inline_rate:.1f} pages/s")
+    print(f"pool ({workers or PARSER_WORKERS} workers): {pool_rate:.1f} pages/s")
+    return inline_rate, pool_rate
+
+
+def record_fixtures(thread_links, posts_per_thread, fixtures_dir, profile="default"):
+    """Scrape live reddit once, saving every listing and post page visited."""
+    work_dir = tempfile.mkdtemp(prefix="scraper_record_")
+    scraper = RedditScraper(
+        profile=profile,
+        # throwaway corpus so already scraped posts still get recorded
+        saver=DataSaver(root=work_dir),
+        recorder=PageRecorder(fixtures_dir),
+    )
+    try:
+        for thread_link in thread_links:
+            post_links = scraper.get_posts(thread_link, max_posts=posts_per_thread)
+            for post_link in post_links[:posts_per_thread]:
+                scraper.get_post_content(post_link)
+    finally:
+        scraper.driver.quit()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    manifest = PageRecorder(fixtures_dir).load_manifest()
+    print(
+        f"Recorded {len(manifest['listings'])} listings and "
+        f"{len(manifest['posts'])} posts into {fixtures_dir}"
+    )
+
+
+def benchmark_replay(
+    fixtures_dir,
+    pool_size=2,
+    posts_per_listing=25,
+    profile="lean",
+    extraction_mode="script",
+    tabs=1,
+    delay=0.0,
+):
+    """
+    Run the real scraping loop against recorded pages served from localhost
+    and report posts/sec, per-phase latency and browser memory.
+    """
+    manifest = PageRecorder(fixtures_dir).load_manifest()
+    recorded_ids = {post_id_from_url(url) for url in manifest["posts"]}
+    if not manifest["listings"]:
+        print(f"[!] Nothing recorded in {fixtures_dir}, run the record command first")
+        return None
+
+    work_dir = tempfile.mkdtemp(prefix="scraper_replay_")
+    saver = DataSaver(root=work_dir)
+    phase_samples = defaultdict(list)
+    memory_samples = []
+    posts_scraped = 0
+    lock = threading.Lock()
+
+    with FixtureServer(fixtures_dir, delay=delay) as server:
+        pool = BrowserPool(
+            pool_size,
+            profile=profile,
+            extraction_mode=extraction_mode,
+            saver=saver,
+            base_url=server.base_url,
+        )
+        # launch every browser up front so startup isnt counted as scraping
+        scrapers = [pool.acquire() for _ in range(pool_size)]
+        for scraper in scrapers:
+            pool.release(scraper)
+
+        jobs = queue.Queue()
+        for listing in manifest["listings"]:
+            jobs.put(listing)
+
+        def worker():
+            nonlocal posts_scraped
+            while True:
+                try:
+                    listing = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                scraper = pool.acquire()
+                try:
+                    post_links = scraper.get_posts(listing, max_posts=10_000)
+                    # only posts that were recorded can be replayed
+                    post_links = [
+                        l for l in post_links if post_id_from_url(l) in recorded_ids
+                    ]
+                    post_links = post_links[:posts_per_listing]
+                    for post in scraper.iter_post_contents(post_links, tabs=tabs):
+                        saver.save_post_data(post)
+                        memory_mb = scraper.browser_memory_mb()
+                        with lock:
+                            posts_scraped += 1
+                            for phase, seconds in scraper.last_timings.items():
+                                phase_samples[phase].append(seconds)
+                            if memory_mb is not None:
+                                memory_samples.append(memory_mb)
+                finally:
+                    pool.release(scraper)
+
+        start_time = time.time()
+        threads = [threading.Thread(target=worker) for _ in range(pool_size)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.time() - start_time
+        pool.close()
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n--- replay benchmark ---")
+    print(
+        f"pool size {pool_size}, profile {profile}, "
+        f"extraction {extraction_mode}, tabs {tabs}"
+    )
+    print(
+        f"Scraped {posts_scraped} posts in {elapsed:.2f}s "
+        f"({posts_scraped / elapsed:.2f} posts/s)"
+    )
+    for phase, samples in phase_samples.items():
+        summarize(f"[{phase}]", samples)
+    if memory_samples:
+        print(
+            f"browser memory: mean {statistics.mean(memory_samples):.0f}MB | "
+            f"peak {max(memory_samples):.0f}MB (per browser)"
+        )
+    return posts_scraped / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the reddit scraper")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    extraction_parser = subparsers.add_parser(
+        "extraction", help="compare per-post latency of the extraction modes"
+    )
+    extraction_parser.add_argument("post_links", nargs="+")
+
+    parser_parser = subparsers.add_parser(
+        "parser", help="lxml parse throughput over recorded html pages"
+    )
+    parser_parser.add_argument("fixtures_dir")
+    parser_parser.add_argument("--workers", type=int, default=None)
+    parser_parser.add_argument("--repeat", type=int, default=5)
+
+    record_parser = subparsers.add_parser(
+        "record", help="save live listing and post pages as replay fixtures"
+    )
+    record_parser.add_argument("threads", nargs="+")
+    record_parser.add_argument("--posts", type=int, default=20)
+    record_parser.add_argument("--fixtures", default="scraper_fixtures")
+    record_parser.add_argument("--profile", default="default")
+
+    replay_parser = subparsers.add_parser(
+        "replay", help="offline scraping benchmark over recorded fixtures"
+    )
+    replay_parser.add_argument("--fixtures", default="scraper_fixtures")
+    replay_parser.add_argument("--pool-size", type=int, default=2)
+    replay_parser.add_argument("--posts", type=int, default=25)
+    replay_parser.add_argument("--profile", default="lean")
+    replay_parser.add_argument(
+        "--extraction-mode", default="script", choices=("elements", "script", "source")
+    )
+    replay_parser.add_argument("--tabs", type=int, default=1)
+    replay_parser.add_argument("--delay", type=float, default=0.0)
+
+    args = parser.parse_args()
+    if args.command == "extraction":
+        benchmark_extraction_modes(args.post_links)
+    elif args.command == "parser":
+        benchmark_parser(args.fixtures_dir, args.workers, args.repeat)
+    elif args.command == "record":
+        record_fixtures(args.threads, args.posts, args.fixtures, args.profile)
+    elif args.command == "replay":
+        benchmark_replay(
+            args.fixtures,
+            args.pool_size,
+            args.posts,
+            args.profile,
+            args.extraction_mode,
+            args.tabs,
+            args.delay,
+        )
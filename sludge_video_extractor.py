@@ -9,9 +9,17 @@ def get_video_duration(video_path):
     return clip.duration
 
 
-def get_subclip(input_video_path, output_video_path, start_time, end_time):
+def get_subclip(
+    input_video_path, output_video_path, start_time, end_time, workspace=None
+):
     clip = VideoFileClip(input_video_path).subclip(start_time, end_time)
-    clip.write_videofile(output_video_path, codec="libx264", logger=None)
+    # moviepy's temp audio file goes in the job workspace, not the current folder
+    temp_audiofile = (
+        workspace.temp_audio_path(output_video_path, "mp3") if workspace else None
+    )
+    clip.write_videofile(
+        output_video_path, codec="libx264", temp_audiofile=temp_audiofile, logger=None
+    )
     clip.close()
     return output_video_path
 
@@ -52,7 +60,12 @@ class Extractor:
     def __init__(self):
         self.videos_dir = r"sludge_videos"
 
-    def get_random_sludge_video(self, target_duration, output_path, expected_dims):
+    def pick_random_segment(self, target_duration):
+        """
+        (video path, start time) of a random target_duration long stretch
+        of a random sludge video, without writing anything. None if the
+        picked video is too short.
+        """
         # grab a random base sludge video
         all_videos = [f for f in os.listdir(self.videos_dir)]
         random_video = random.choice(all_videos)
@@ -64,12 +77,23 @@ class Extractor:
         duration = int(get_video_duration(base_sludge_video_path))
         if duration < target_duration:
             print(f"Video {random_video} is too short ({duration}s), skipping.")
-            return False
+            return None
         possible_start_times = range(10, duration - target_duration - 10)
         start_time = random.choice(possible_start_times)
+        return base_sludge_video_path, start_time
+
+    def get_random_sludge_video(
+        self, target_duration, output_path, expected_dims, workspace=None
+    ):
+        segment = self.pick_random_segment(target_duration)
+        if segment is None:
+            return False
+        base_sludge_video_path, start_time = segment
         end_time = start_time + target_duration
 
-        get_subclip(base_sludge_video_path, output_path, start_time, end_time)
+        get_subclip(
+            base_sludge_video_path, output_path, start_time, end_time, workspace
+        )
 
         stretch_video_dims(
             output_path, expected_dims[0], expected_dims[1], in_place=True
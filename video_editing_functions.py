@@ -1,58 +1,315 @@
+import itertools
+import subprocess
+
 import cv2
+import imageio_ffmpeg
+import numpy as np
 from moviepy.editor import VideoFileClip, AudioFileClip, CompositeVideoClip
 
 
-def stack_videos_vertically(top_video_path, bottom_video_path, out_video_path):
-    cap1 = cv2.VideoCapture(top_video_path)
-    cap2 = cv2.VideoCapture(bottom_video_path)
+def write_video(clip, out_video_path, workspace=None):
+    # with a workspace, moviepy's temp audio file lands in it instead of
+    # the current folder
+    temp_audiofile = workspace.temp_audio_path(out_video_path) if workspace else None
+    clip.write_videofile(
+        out_video_path,
+        codec="libx264",
+        audio_codec="aac",
+        temp_audiofile=temp_audiofile,
+        logger=None,
+    )
+
+
+###frame streams: sources, filters and sinks over numpy frames
+#
+# A FrameStream is a lazy video: BGR uint8 frames of a declared size and
+# fps, produced one at a time as it is iterated. Sources open a video or
+# an image, filters wrap a stream in another, and write_frames pipes the
+# result into ffmpeg, so a whole pipeline holds a frame or two in memory
+# and never writes an intermediate file. Streams are single use; split
+# one with tee_frames to feed it to two filters.
+# scroll_image, stack_videos_vertically, make_blur_video,
+# paste_video_onto_video, add_fade_background and caption_video are
+# path wrappers over these.
+
+
+class FrameStream:
+    def __init__(self, frames, size, fps, frame_count=None):
+        self.frames = frames
+        self.size = (int(size[0]), int(size[1]))
+        self.fps = fps
+        # None when the length isn't known until the stream runs out
+        self.frame_count = frame_count
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    @property
+    def duration(self):
+        if self.frame_count is None:
+            return None
+        return self.frame_count / self.fps
+
+    def __iter__(self):
+        return iter(self.frames)
 
-    # Ensure both videos are open
-    if not cap1.isOpened():
-        raise ValueError(
-            f"top_video_path: {top_video_path} is invalid or cannot be opened."
+
+class FrameReader:
+    """
+    Frames of a video from start_time on, fetched by timestamp. Frames in
+    between are grabbed without decoding, and the last frame is repeated
+    when asked for the same moment again (a source slower than the output).
+    """
+
+    def __init__(self, video_path, start_time=0):
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Cannot open video file: {video_path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.size = (
+            int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
         )
-    if not cap2.isOpened():
-        raise ValueError(
-            f"bottom_video_path: {bottom_video_path} is invalid or cannot be opened."
+        if start_time:
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, start_time * 1000)
+        self.next_index = 0
+        self.frame = None
+
+    def frame_at(self, t):
+        """The frame showing at t seconds in, or None past the end."""
+        target = int(round(t * self.fps, 6))
+        while self.next_index < target:
+            self.cap.grab()
+            self.next_index += 1
+        if self.next_index == target:
+            ok, frame = self.cap.read()
+            self.next_index += 1
+            self.frame = frame if ok else None
+        return self.frame
+
+    def release(self):
+        self.cap.release()
+
+
+def video_frames(video_path, start_time=0, duration=None, fps=None):
+    """
+    Source: the frames of video_path from start_time on, for duration
+    seconds or to the end. With fps the video is resampled to that rate.
+    """
+    reader = FrameReader(video_path, start_time)
+    fps = fps or reader.fps
+    frame_count = int(duration * fps) if duration is not None else None
+    # without a duration the container's frame count says how long it
+    # should run (the loop below still goes to the last frame)
+    expected_count = frame_count
+    if expected_count is None and reader.frame_count > 0:
+        remaining = reader.frame_count / reader.fps - start_time
+        expected_count = max(0, int(round(remaining * fps)))
+
+    def frames():
+        try:
+            i = 0
+            while frame_count is None or i < frame_count:
+                frame = reader.frame_at(i / fps)
+                if frame is None:
+                    if frame_count is not None:
+                        print(f"[!] {video_path} ran out of frames at {i / fps:.2f}s")
+                    break
+                yield frame
+                i += 1
+        finally:
+            reader.release()
+
+    return FrameStream(frames(), reader.size, fps, expected_count)
+
+
+def image_scroll_frames(image_path, scroll_duration, height, fps=30):
+    """Source: a window height pixels tall scrolling down image_path."""
+    image = cv2.imread(image_path)
+    if image is None:
+        raise ValueError("Image not found or unable to read.")
+    if image.shape[0] < height:
+        # a post shorter than the window just sits there on white
+        image = cv2.copyMakeBorder(
+            image, 0, height - image.shape[0], 0, 0,
+            cv2.BORDER_CONSTANT, value=(255, 255, 255),
         )
+    img_height, img_width, _ = image.shape
+    total_frames = int(scroll_duration * fps)
 
-    # Get properties (assume same fps)
-    fps = cap1.get(cv2.CAP_PROP_FPS)
-    width1 = int(cap1.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height1 = int(cap1.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    def frames():
+        for i in range(total_frames):
+            offset = int((i / total_frames) * (img_height - height))
+            yield image[offset : offset + height]
 
-    width2 = int(cap2.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height2 = int(cap2.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    return FrameStream(frames(), (img_width, height), fps, total_frames)
 
-    # Resize to same width (if needed)
-    common_width = min(width1, width2)
 
-    height1_resized = int(height1 * common_width / width1)
-    height2_resized = int(height2 * common_width / width2)
-    out_height = height1_resized + height2_resized
+def tee_frames(stream, n=2):
+    """
+    n copies of stream, decoded once. Copies consumed in step (like the
+    two sides of a paste) only ever hold a frame between them.
+    """
+    return [
+        FrameStream(frames, stream.size, stream.fps, stream.frame_count)
+        for frames in itertools.tee(stream, n)
+    ]
 
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(out_video_path, fourcc, fps, (common_width, out_height))
 
-    while True:
-        ret1, frame1 = cap1.read()
-        ret2, frame2 = cap2.read()
+def resize_frames(stream, size):
+    size = (int(size[0]), int(size[1]))
+    if size == stream.size:
+        return stream
+    frames = (cv2.resize(frame, size) for frame in stream)
+    return FrameStream(frames, size, stream.fps, stream.frame_count)
 
-        if not ret1 or not ret2:
-            break
 
-        frame1_resized = cv2.resize(frame1, (common_width, height1_resized))
-        frame2_resized = cv2.resize(frame2, (common_width, height2_resized))
+def blur_frames(stream, blur_amount, size=None, scale=1.0):
+    """
+    Gaussian blur every frame, resized to size on the way. With scale
+    under 1 the blur is computed that much smaller and scaled back up,
+    which is much cheaper and looks the same for heavy blurs.
+    """
+    size = stream.size if size is None else (int(size[0]), int(size[1]))
+    blur_size = (max(1, int(size[0] * scale)), max(1, int(size[1] * scale)))
+    # cv2.GaussianBlur wants an odd kernel size
+    kernel = max(1, int(blur_amount * scale)) | 1
+
+    def frames():
+        for frame in stream:
+            if frame.shape[1::-1] != blur_size:
+                frame = cv2.resize(frame, blur_size, interpolation=cv2.INTER_AREA)
+            frame = cv2.GaussianBlur(frame, (kernel, kernel), 0)
+            if blur_size != size:
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+            yield frame
+
+    return FrameStream(frames(), size, stream.fps, stream.frame_count)
+
+
+def stack_frames_vertically(top, bottom):
+    """Top over bottom at the narrower width, until either runs out."""
+    common_width = min(top.width, bottom.width)
+    top = resize_frames(top, (common_width, top.height * common_width // top.width))
+    bottom = resize_frames(
+        bottom, (common_width, bottom.height * common_width // bottom.width)
+    )
+    frames = (cv2.vconcat([t, b]) for t, b in zip(top, bottom))
+    counts = [c for c in (top.frame_count, bottom.frame_count) if c is not None]
+    return FrameStream(
+        frames,
+        (common_width, top.height + bottom.height),
+        top.fps,
+        min(counts) if counts else None,
+    )
 
-        stacked = cv2.vconcat([frame1_resized, frame2_resized])
-        out.write(stacked)
 
-    cap1.release()
-    cap2.release()
-    out.release()
+def paste_frames_onto_frames(foreground, background, foreground_pad):
+    """
+    The foreground, shrunk by foreground_pad on each side, centered over
+    the background for as long as the foreground lasts. A background that
+    runs out early holds its last frame.
+    """
+    foreground_width = foreground.width - foreground_pad * 2
+    foreground = resize_frames(
+        foreground,
+        (foreground_width, foreground.height * foreground_width // foreground.width),
+    )
+    x0 = (background.width - foreground.width) // 2
+    y0 = (background.height - foreground.height) // 2
+    # a foreground bigger than the background is cropped to it
+    crop_x, crop_y = max(0, -x0), max(0, -y0)
+    x0, y0 = max(0, x0), max(0, y0)
+    x1 = min(background.width, x0 + foreground.width - crop_x)
+    y1 = min(background.height, y0 + foreground.height - crop_y)
+
+    def frames():
+        background_frames = iter(background)
+        background_frame = None
+        for foreground_frame in foreground:
+            background_frame = next(background_frames, background_frame)
+            if background_frame is None:
+                return
+            frame = background_frame.copy()
+            frame[y0:y1, x0:x1] = foreground_frame[
+                crop_y : crop_y + y1 - y0, crop_x : crop_x + x1 - x0
+            ]
+            yield frame
+
+    return FrameStream(frames(), background.size, foreground.fps, foreground.frame_count)
+
+
+def write_frames(stream, out_video_path, audio_path=None, preset="medium"):
+    """
+    Sink: encode stream into out_video_path with ffmpeg, with the audio
+    of audio_path (an audio file or a video) muxed in and trimmed to the
+    video. Returns out_video_path.
+    """
+    command = [
+        imageio_ffmpeg.get_ffmpeg_exe(),
+        "-y",
+        "-loglevel", "error",
+        "-f", "rawvideo",
+        "-pix_fmt", "bgr24",
+        "-s", f"{stream.width}x{stream.height}",
+        "-r", str(stream.fps),
+        "-i", "-",
+    ]
+    if audio_path is not None:
+        # the trailing ? lets a video without an audio track through
+        command += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0?"]
+    command += [
+        # yuv420p needs even dimensions; pad an odd edge by a pixel
+        "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+        "-c:v", "libx264",
+        "-preset", preset,
+        "-pix_fmt", "yuv420p",
+    ]
+    if audio_path is not None:
+        command += ["-c:a", "aac"]
+        if stream.frame_count is not None:
+            command += ["-t", f"{stream.frame_count / stream.fps:.3f}"]
+        else:
+            command += ["-shortest"]
+    command.append(out_video_path)
+
+    encoder = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    expected_shape = (stream.height, stream.width, 3)
+    try:
+        for frame in stream:
+            if frame.shape != expected_shape:
+                raise ValueError(
+                    f"Frame of shape {frame.shape} in a {stream.width}x{stream.height} stream"
+                )
+            encoder.stdin.write(np.ascontiguousarray(frame).tobytes())
+    except BrokenPipeError:
+        pass
+    finally:
+        encoder.stdin.close()
+        error = encoder.stderr.read().decode(errors="replace")
+        encoder.wait()
+    if encoder.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed writing {out_video_path}: {error}")
+
+    return out_video_path
 
 
-def add_audio_to_video(video_path, audio_path, out_video_path):
+def stack_videos_vertically(top_video_path, bottom_video_path, out_video_path):
+    write_frames(
+        stack_frames_vertically(
+            video_frames(top_video_path), video_frames(bottom_video_path)
+        ),
+        out_video_path,
+    )
+
+
+def add_audio_to_video(video_path, audio_path, out_video_path, workspace=None):
     # Load the video and audio
     video = VideoFileClip(video_path)
     audio = AudioFileClip(audio_path)
@@ -65,7 +322,7 @@ def add_audio_to_video(video_path, audio_path, out_video_path):
     final_video = video.set_audio(audio)
 
     # Write the final video
-    final_video.write_videofile(out_video_path, codec="libx264", audio_codec="aac", logger=None)
+    write_video(final_video, out_video_path, workspace)
 
     return out_video_path
 
@@ -77,38 +334,12 @@ def get_video_duration(video_path):
     return duration
 
 
-def resize_video(video_path, output_path, width, height):
-    # Load the video
-    video = VideoFileClip(video_path)
-
-    # Resize video
-    resized_video = video.resize(newsize=(width, height))
-
-    # Write the result
-    resized_video.write_videofile(output_path, codec="libx264", audio_codec="aac", logger=None)
-
-    return output_path
-
-
 def make_blur_video(video_path, output_path, blur_amount):
-    # Ensure blur_amount is odd and >= 1 (required by cv2.GaussianBlur)
-    if blur_amount % 2 == 0:
-        blur_amount += 1
-    if blur_amount < 1:
-        blur_amount = 1
-
-    # Define a frame-blurring function using OpenCV
-    def blur_frame(frame):
-        return cv2.GaussianBlur(frame, (blur_amount, blur_amount), 0)
-
-    # Load the video and apply blur
-    video = VideoFileClip(video_path)
-    blurred_video = video.fl_image(blur_frame)
-
-    # Write the result
-
-    blurred_video.write_videofile(output_path, codec="libx264", audio_codec="aac", logger=None)
-
+    write_frames(
+        blur_frames(video_frames(video_path), blur_amount),
+        output_path,
+        audio_path=video_path,
+    )
     return output_path
 
 
@@ -125,54 +356,19 @@ def get_video_dims(video_path):
     return width, height
 
 
-def resize_video_keep_aspect_ratio(video_path, output_path, target_width):
-    # Load the video
-    video = VideoFileClip(video_path)
-
-    # Calculate new height to preserve aspect ratio
-    aspect_ratio = video.h / video.w
-    target_height = int(target_width * aspect_ratio)
-
-    # Resize video
-    resized_video = video.resize(newsize=(target_width, target_height))
-
-    # Write the result
-    resized_video.write_videofile(output_path, codec="libx264", audio_codec="aac", logger=None)
-
-    return output_path
-
-
 def paste_video_onto_video(
     foreground_video, background_video, foreground_video_pad, output_path
 ):
-    # Get original foreground width
-    foreground_width, _ = get_video_dims(foreground_video)
-    new_foreground_width = foreground_width - (foreground_video_pad * 2)
-
-    # Resize foreground while keeping aspect ratio
-    foreground_video_resized = resize_video_keep_aspect_ratio(
-        foreground_video, r"temp/foreground_resized.mp4", new_foreground_width
+    # foreground audio dominates
+    write_frames(
+        paste_frames_onto_frames(
+            video_frames(foreground_video),
+            video_frames(background_video),
+            foreground_video_pad,
+        ),
+        output_path,
+        audio_path=foreground_video,
     )
-
-    # Load background and foreground clips
-    background_clip = VideoFileClip(background_video)
-    foreground_clip = VideoFileClip(foreground_video_resized)
-
-    # Center foreground on background
-    x_center = (background_clip.w - foreground_clip.w) // 2
-    y_center = (background_clip.h - foreground_clip.h) // 2
-    foreground_clip = foreground_clip.set_position((x_center, y_center))
-
-    # Match background duration to foreground
-    background_clip = background_clip.set_duration(foreground_clip.duration)
-
-    # Composite the two clips
-    final = CompositeVideoClip([background_clip, foreground_clip])
-    final = final.set_audio(foreground_clip.audio)  # foreground audio dominates
-
-    # Write to file
-    final.write_videofile(output_path, codec="libx264", audio_codec="aac", logger=None)
-
     return output_path
 
 
@@ -185,46 +381,57 @@ def add_fade_background(main_video, fade_video, output_path):
         print("[!] Fatal error: Main video and fade video durations do not match!")
         return False
 
-    # resize the background video to same dims are foreground video
-    full_background_dims = get_video_dims(main_video)
-    resized_backgrond_video_path = r"temp/resized_fade_video.mp4"
-    resize_video(
-        fade_video,
-        resized_backgrond_video_path,
-        full_background_dims[0],
-        full_background_dims[1],
+    # the fade video, resized to the main video and blurred, behind it
+    main = video_frames(main_video)
+    background = blur_frames(video_frames(fade_video, fps=main.fps), 70, size=main.size)
+    write_frames(
+        paste_frames_onto_frames(main, background, 50),
+        output_path,
+        audio_path=main_video,
     )
-
-    # fade that video
-    fade_video_background_clip_path = r"temp/fade_video_background_70.mp4"
-    make_blur_video(resized_backgrond_video_path, fade_video_background_clip_path, 70)
-    paste_video_onto_video(main_video, fade_video_background_clip_path, 50, output_path)
+    return output_path
 
 
 def scroll_image(image_path, out_video_path, scroll_duration, height):
-    # Load the image
-    image = cv2.imread(image_path)
-    if image is None:
-        raise ValueError("Image not found or unable to read.")
-
-    # Get image dimensions
-    img_height, img_width, _ = image.shape
-
-    # Calculate the number of frames needed for the scroll
-    fps = 30  # Frames per second
-    total_frames = int(scroll_duration * fps)
-
-    # Create a VideoWriter object
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(out_video_path, fourcc, fps, (img_width, height))
+    write_frames(
+        image_scroll_frames(image_path, scroll_duration, height, fps=30),
+        out_video_path,
+    )
 
-    for i in range(total_frames):
-        # Calculate the vertical offset for scrolling
-        offset = int((i / total_frames) * (img_height - height))
-        frame = image[offset : offset + height, :, :]
-        out.write(frame)
 
-    out.release()
+def render_stacked_scroll_video(
+    image_path,
+    sludge_video_path,
+    sludge_start_time,
+    duration,
+    scroll_height,
+    sludge_height,
+    audio_path,
+    out_video_path,
+    foreground_pad=50,
+    blur_amount=70,
+    fps=30,
+    preset="medium",
+):
+    """
+    The stacked scroll video in one pass, with no intermediate files:
+    the same picture scroll_image -> stack_videos_vertically ->
+    add_fade_background -> add_audio_to_video produce, as one frame
+    stream written by a single ffmpeg that also muxes the narration.
+    """
+    scroll = image_scroll_frames(image_path, duration, scroll_height, fps)
+    sludge, sludge_background = tee_frames(
+        video_frames(sludge_video_path, sludge_start_time, duration, fps)
+    )
+    stacked = stack_frames_vertically(
+        scroll, resize_frames(sludge, (scroll.width, sludge_height))
+    )
+    # a blur this heavy looks the same computed at a quarter of the size
+    background = blur_frames(
+        sludge_background, blur_amount, size=stacked.size, scale=0.25
+    )
+    frames = paste_frames_onto_frames(stacked, background, foreground_pad)
+    return write_frames(frames, out_video_path, audio_path=audio_path, preset=preset)
 
 
 ###bs for adding captions over videos
@@ -244,6 +451,7 @@ def render_caption_frame(
     font_path: str = r"sour_gummy_fonts\SourGummy-Bold.ttf",
     max_line_length: int = 10,  # Wrap after this many characters
     save: bool = False,
+    workspace=None,
 ) -> Image.Image:
 
     start_time = time.time()
@@ -313,8 +521,9 @@ def render_caption_frame(
     print(f"🖼️ Rendered caption frame in {time.time() - start_time:.2f} seconds")
 
     if save:
-        os.makedirs("temp", exist_ok=True)
-        path = f"temp/{len(os.listdir('temp'))}_caption_frame.png"
+        folder = workspace.folder("caption_frames") if workspace else "temp"
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{len(os.listdir(folder))}_caption_frame.png")
         img.save(path)
         print(f"📦 Caption frame saved as {path}")
         return path
@@ -332,6 +541,7 @@ def overlay_images_onto_video(
     video_path: str,
     frames: list,
     out_video_path: str = "captioned_output.mp4",
+    workspace=None,
 ) -> str:
     """
     Overlays multiple image frames onto a video at specified times.
@@ -369,7 +579,7 @@ def overlay_images_onto_video(
 
     # Combine video with all image clips
     final = CompositeVideoClip([video] + image_clips)
-    final.write_videofile(out_video_path, codec="libx264", audio_codec="aac", logger=None)
+    write_video(final, out_video_path, workspace)
 
     print(
         f"✅ Overlayed {len(frames)} frames onto video in {time.time() - t0:.2f} seconds"
@@ -383,6 +593,7 @@ def overlay_image_onto_video(
     start_time: float,
     end_time: float,
     out_video_path: str = "captioned_output.mp4",
+    workspace=None,
 ) -> str:
     t0 = time.time()
 
@@ -403,49 +614,68 @@ def overlay_image_onto_video(
 
     # Combine original video and the image clip
     composite = CompositeVideoClip([video, img_clip])
-    composite.write_videofile(out_video_path, codec="libx264", audio_codec="aac", logger=None)
+    write_video(composite, out_video_path, workspace)
 
     print(f"✅ Overlayed frame onto video in {time.time() - t0:.2f} seconds")
     return out_video_path
 
 
-def caption_video(video_path, caption_frames, out_video_path):
-    # compile caption_frames data into a list of dicts with frame_path, start_time, end_time
-    frame_datums = []
-    video_dims = get_video_dims(video_path)
-    for caption_frame in caption_frames:
-        words = caption_frame["words"]
-        highlight_index = caption_frame["highlight_index"]
-        start_time = caption_frame["start_time"]
-        end_time = caption_frame["end_time"]
-        frame_path = render_caption_frame(
-            video_dims,
-            words,
-            highlight_index,
-            save=True,
-        )
-        frame_datum = {
-            "frame_path": frame_path,
-            "start_time": start_time,
-            "end_time": end_time,
-        }
-        frame_datums.append(frame_datum)
-
-    # use that to batch overlay images onto video
-    overlay_images_onto_video(
-        video_path,
-        frame_datums,
-        out_video_path,
+def caption_overlay(frame_size, caption):
+    # the caption rendered full frame, cropped to the pixels it covers
+    img = render_caption_frame(
+        frame_size, caption["words"], caption["highlight_index"]
     )
+    bbox = img.getchannel("A").getbbox()
+    if bbox is None:
+        return None
+    region = np.array(img.crop(bbox))
+    # bottom center, where overlay_images_onto_video puts it
+    x = (frame_size[0] - img.width) // 2 + bbox[0]
+    y = frame_size[1] - img.height + bbox[1]
+    bgr = region[..., 2::-1].astype(np.float32)
+    alpha = region[..., 3:].astype(np.float32) / 255
+    return caption["end_time"], x, y, bgr, alpha
+
+
+def overlay_captions(stream, captions):
+    """
+    Filter: each caption (words, highlight_index, start_time, end_time)
+    over the frames it spans. Captions are rendered as they come up, so
+    only the ones on screen are held in memory.
+    """
+    captions = sorted(captions, key=lambda caption: caption["start_time"])
+
+    def frames():
+        upcoming = iter(captions)
+        next_caption = next(upcoming, None)
+        on_screen = []
+        for i, frame in enumerate(stream):
+            t = i / stream.fps
+            while next_caption is not None and next_caption["start_time"] <= t:
+                if next_caption["end_time"] > t:
+                    overlay = caption_overlay(stream.size, next_caption)
+                    if overlay is not None:
+                        on_screen.append(overlay)
+                next_caption = next(upcoming, None)
+            on_screen = [overlay for overlay in on_screen if overlay[0] > t]
+
+            if on_screen:
+                frame = frame.copy()
+                for _, x, y, bgr, alpha in on_screen:
+                    roi = frame[y : y + bgr.shape[0], x : x + bgr.shape[1]]
+                    roi[:] = roi * (1 - alpha) + bgr * alpha
+            yield frame
+
+    return FrameStream(frames(), stream.size, stream.fps, stream.frame_count)
 
-    def clear_temp_frame_images(frame_datums):
-        for frame_datum in frame_datums:
-            frame_path = frame_datum["frame_path"]
-            if os.path.exists(frame_path):
-                os.remove(frame_path)
-                print(f"Removed temporary frame image: {frame_path}")
 
-    clear_temp_frame_images(frame_datums)
+def caption_video(video_path, caption_frames, out_video_path):
+    write_frames(
+        overlay_captions(video_frames(video_path), caption_frames),
+        out_video_path,
+        audio_path=video_path,
+    )
+    return out_video_path
 
 
 if __name__ == "__main__":
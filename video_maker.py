@@ -2,26 +2,33 @@ print(f"Importing modules...")
 
 from transcriber_local import Transcriber
 from scraper import DataSaver
+from post_usage import PostUsageHistory
 from narrarate import narrate
-from post_image_maker import make_reddit_post_image
+from post_image_maker import (
+    make_reddit_post_image,
+    BODY_TEXT_MAX_LENGTH,
+    BODY_TEXT_MIN_LENGTH,
+    THREAD_NAME_MAX_LENGTH,
+    USERNAME_MAX_LENGTH,
+)
 from caption_maker import extract_word_timestamps_from_transcript
 
 
+import contextlib
 import json
-import random
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from sludge_video_extractor import Extractor
 from moviepy.editor import VideoFileClip, AudioFileClip, CompositeVideoClip
 import os
-import stat
-import pathlib
-import platform
-import subprocess
 
+from workspace import Workspace
 from video_editing_functions import (
     scroll_image,
     stack_videos_vertically,
     add_fade_background,
     add_audio_to_video,
+    render_stacked_scroll_video,
 )
 
 
@@ -32,6 +39,18 @@ VIDEO_DIMS = (1080, 1920)
 SLOP_VIDEO_VERTICAL_PERCENT = 0.4
 
 
+# render the stacked video in one pass straight into the final file
+# (render_stacked_scroll_video); False goes through the intermediate
+# mp4s of the step by step pipeline instead
+SINGLE_PASS_RENDER = True
+
+# how many videos create_all_stacked_reddit_scroll_videos renders at once,
+# each in its own process; the cores are split evenly between them
+VIDEO_WORKERS = max(1, (os.cpu_count() or 1) // 4)
+# a worker process is replaced after this many videos, so leaks in the
+# media libraries dont pile up over a long production run
+VIDEOS_PER_WORKER_PROCESS = 10
+
 SCROLLING_REDDIT_POST_HEIGHT = int(VIDEO_DIMS[1] * SLOP_VIDEO_VERTICAL_PERCENT)
 SUB_SLUDGE_VIDEO_DIMS = (
     VIDEO_DIMS[0],
@@ -39,51 +58,26 @@ SUB_SLUDGE_VIDEO_DIMS = (
 )
 
 
-class PostUsageHistory:
-    def __init__(self):
-        self.fp = "post_usage_history.csv"
-
-        if not os.path.exists(self.fp):
-            with open(self.fp, "w") as f:
-                f.write("example_post_url1,example_post_url2")
-
-    def add_post(self, post_url):
-        with open(self.fp, "a") as f:
-            f.write(f",{post_url}")
-
-    def get_all_posts(self):
-        with open(self.fp, "r") as f:
-            content = f.read().strip()
-            if not content:
-                return []
-            return content.split(",")
-
-    def post_exists(self, post_url):
-        existing_posts = self.get_all_posts()
-        if post_url in existing_posts:
-            return True
-        return False
-
-
-def get_post_image(posts, expected_width):
-    attempts = 0
-    max_attempts = 5000
-    while 1:
-        attempts += 1
-
-        if attempts > max_attempts:
-            print(f"Failed to create a post image after {max_attempts} attempts.")
-            break
-
-        # select a random post
-        random_post = random.choice(posts)
-        post_data = random_post.to_dict()
+def get_post_image(expected_width, max_attempts=5000, image_dir="reddit_post_images"):
+    # only posts that fit the image template and havent been used come back
+    post_usage_history = PostUsageHistory()
+    candidates = DataSaver().query_posts(
+        exclude_urls=post_usage_history.get_all_posts(),
+        limit=max_attempts,
+        min_content_len=BODY_TEXT_MIN_LENGTH,
+        max_content_len=BODY_TEXT_MAX_LENGTH,
+        max_thread_len=THREAD_NAME_MAX_LENGTH,
+        max_username_len=USERNAME_MAX_LENGTH,
+    )
 
-        # if url has been used before, retry
+    image_path, post_data = None, None
+    for post in candidates:
+        post_data = post.to_dict()
         post_url = post_data["url"]
-        post_usage_history = PostUsageHistory()
-        if post_usage_history.post_exists(post_url):
-            # print(f"Post {post_url} already used, skipping...")
+        # claim before rendering, another video worker may have taken it
+        # since the candidates were picked. a post that fails to render
+        # (dead avatar url) stays claimed, it would fail again next time
+        if not post_usage_history.claim(post_url):
             continue
 
         # try to use this stuff to make the post image
@@ -96,109 +90,74 @@ def get_post_image(posts, expected_width):
             username=post_data["username"],
             expected_width=expected_width,
             save=True,
+            save_path=image_dir,
         )
 
-        # if making the image didnt work, retry with another post
-        if image_path is None:
-            # print(f"Failed to turn that into a post...")
-            post_usage_history.add_post(post_url)
-            continue
-
-        # successfully made the image from an unused post
-        post_usage_history.add_post(post_url)
-        break
+        if image_path is not None:
+            break
 
+    if image_path is None:
+        print(f"Failed to create a post image from any eligible post.")
 
     return image_path, post_data
 
 
-def cleanup_temp_files():
-    folders = [
-        r"temp",
-        r"narrations",
-        r"reddit_post_images",
-    ]
-
-    for folder_path in folders:
-        folder = pathlib.Path(folder_path)
-
-        if not folder.exists():
-            continue
-
-        for item in folder.rglob("*"):  # recursively find all contents
-            try:
-                if item.is_file():
-                    make_deletable(item)
-                    delete_file(item)
-                elif item.is_dir():
-                    # Only delete empty directories after files are gone
-                    try:
-                        item.rmdir()
-                    except OSError:
-                        # Directory not empty (yet), will retry later
-                        pass
-            except Exception as e:
-                print(f"[!] Failed to delete {item}: {e}")
-
-        # After clearing contents, attempt to remove any remaining empty subfolders
-        for item in sorted(folder.rglob("*"), reverse=True):
-            if item.is_dir():
-                try:
-                    item.rmdir()
-                except Exception:
-                    pass  # still not empty, or permission issue
-
-
-def make_deletable(file):
+def reserve_numbered_path(folder, name_format, is_dir=False):
+    """
+    First free folder/name_format.format(index), counting up from the
+    number of entries in folder. It is created on the spot so concurrent
+    video jobs never end up with the same one.
+    """
+    os.makedirs(folder, exist_ok=True)
+    index = len(os.listdir(folder))
+    while True:
+        path = os.path.join(folder, name_format.format(index))
+        try:
+            if is_dir:
+                os.mkdir(path)
+            else:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            index += 1
+
+
+@contextlib.contextmanager
+def reserved_output_path(folder, name_format):
+    """
+    reserve_numbered_path for a video about to be rendered into it. If the
+    render fails the reservation is removed, so no empty file is left in
+    folder looking like a finished video.
+    """
+    path = reserve_numbered_path(folder, name_format)
     try:
-        os.chmod(file, stat.S_IWUSR | stat.S_IRUSR)
-    except Exception:
-        pass
-
-
-def delete_file(file):
-    if platform.system() == "Windows":
+        yield path
+    except BaseException:
         try:
-            subprocess.run(
-                ["takeown", "/f", str(file)],
-                check=False,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-            subprocess.run(
-                ["icacls", str(file), "/grant", "Everyone:F"],
-                check=False,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-            subprocess.run(
-                ["del", "/f", "/q", str(file)],
-                shell=True,
-                check=False,
-            )
-        except Exception:
+            os.remove(path)
+        except FileNotFoundError:
             pass
-    else:
-        try:
-            file.unlink()
-        except PermissionError:
-            subprocess.run(["sudo", "rm", "-f", str(file)], check=False)
+        raise
 
 
-def create_stacked_reddit_scroll_video(output_dir):
-    temp_folder_name = r"temp"
-    os.makedirs(temp_folder_name, exist_ok=True)
-    cleanup_temp_files()
+def create_stacked_reddit_scroll_video(output_dir, workspace=None):
+    # every intermediate file lives in the job's workspace, so jobs running
+    # at the same time never share a path; without one a throwaway
+    # workspace is made and removed here
+    owns_workspace = workspace is None
+    workspace = workspace or Workspace()
+    try:
+        return _create_stacked_reddit_scroll_video(output_dir, workspace)
+    finally:
+        if owns_workspace:
+            workspace.cleanup()
 
-    # get scraped post data
-    print(f"[1] Getting saved scraped reddit data...")
-    reddit_data_manager = DataSaver()
-    posts = reddit_data_manager.get_all_posts()
 
-    # create the static reddit post
-    print(f"[2] Creating the static reddit post image...")
+def _create_stacked_reddit_scroll_video(output_dir, workspace):
+    # create the static reddit post from an eligible, unused post
+    print(f"[1] Selecting a post and creating the static reddit post image...")
     post_image_save_path, post_data = get_post_image(
-        posts, expected_width=VIDEO_DIMS[0]
+        expected_width=VIDEO_DIMS[0], image_dir=workspace.folder("reddit_post_images")
     )
     if post_image_save_path in [False, None]:
         print(
@@ -213,12 +172,32 @@ def create_stacked_reddit_scroll_video(output_dir):
     narration_content = f"{post_title}. {post_text}"
 
     narration_audio_file_path, narration_duration = narrate(
-        "jf_alpha", narration_content
+        "jf_alpha", narration_content, output_folder=workspace.folder("narrations")
     )
 
+    if SINGLE_PASS_RENDER:
+        print(f"[2] Rendering the stacked video in a single pass...")
+        segment = Extractor().pick_random_segment(narration_duration)
+        if segment is None:
+            return False
+        sludge_video_path, sludge_start_time = segment
+        with reserved_output_path(output_dir, "{}.mp4") as narrated_video_path:
+            render_stacked_scroll_video(
+                image_path=post_image_save_path,
+                sludge_video_path=sludge_video_path,
+                sludge_start_time=sludge_start_time,
+                duration=narration_duration,
+                scroll_height=SCROLLING_REDDIT_POST_HEIGHT,
+                sludge_height=SUB_SLUDGE_VIDEO_DIMS[1],
+                audio_path=narration_audio_file_path,
+                out_video_path=narrated_video_path,
+            )
+        print(f"Created a sludge video at {narrated_video_path}")
+        return narrated_video_path, narration_content
+
     # make that a scrolling video
-    print(f"[3] Converting the post image to a scrolling video...")
-    scrolling_reddit_post_video_path = r"temp/reddit_post_scrolling_video.mp4"
+    print(f"[2] Converting the post image to a scrolling video...")
+    scrolling_reddit_post_video_path = workspace.path("reddit_post_scrolling_video.mp4")
     scroll_image(
         image_path=post_image_save_path,
         out_video_path=scrolling_reddit_post_video_path,
@@ -229,43 +208,44 @@ def create_stacked_reddit_scroll_video(output_dir):
 
     # craft the sub sludge video (subway
     # surfers, minecraft parkour, whatever)
-    print(f"[4] Crafting a sub sludge video...")
+    print(f"[3] Crafting a sub sludge video...")
     sub_sludge_extractor = Extractor()
-    sub_sludge_video_path = r"temp/sub_sludge_video.mp4"
+    sub_sludge_video_path = workspace.path("sub_sludge_video.mp4")
     sub_sludge_extractor.get_random_sludge_video(
-        narration_duration, sub_sludge_video_path, SUB_SLUDGE_VIDEO_DIMS
+        narration_duration, sub_sludge_video_path, SUB_SLUDGE_VIDEO_DIMS, workspace
     )
   
 
     # put the videos on top of eachother
-    print(f"[5] Creating stacked video...")
-    stacked_video_path = r"temp/stacked_video.mp4"
+    print(f"[4] Creating stacked video...")
+    stacked_video_path = workspace.path("stacked_video.mp4")
     stack_videos_vertically(
         scrolling_reddit_post_video_path, sub_sludge_video_path, stacked_video_path
     )
 
     # add fadebackground with pad
-    print(f'[6] Adding the faded background...')
-    stacked_video_with_background_path = r"temp/stacked_video_with_background.mp4"
+    print(f'[5] Adding the faded background...')
+    stacked_video_with_background_path = workspace.path(
+        "stacked_video_with_background.mp4"
+    )
     add_fade_background(
-        stacked_video_path, sub_sludge_video_path, stacked_video_with_background_path
+        stacked_video_path,
+        sub_sludge_video_path,
+        stacked_video_with_background_path,
     )
 
     # narrate that stacked video
-    print(f"[7] Adding narration to the stacked video...")
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    video_index = len(os.listdir(output_dir))
-    narrated_video_path = f"{output_dir}/{video_index}.mp4"
-    add_audio_to_video(
-        video_path=stacked_video_with_background_path,
-        audio_path=narration_audio_file_path,
-        out_video_path=narrated_video_path,
-    )
+    print(f"[6] Adding narration to the stacked video...")
+    with reserved_output_path(output_dir, "{}.mp4") as narrated_video_path:
+        add_audio_to_video(
+            video_path=stacked_video_with_background_path,
+            audio_path=narration_audio_file_path,
+            out_video_path=narrated_video_path,
+            workspace=workspace,
+        )
     
     
     print(f"Created a sludge video at {narrated_video_path}")
-    cleanup_temp_files()
     return narrated_video_path, narration_content
 
 
@@ -278,10 +258,7 @@ def compile_video_and_metadata(video_path, metadata_dict, output_folder):
         print(f"Fatal error: This metadata is not valid: {metadata_dict}")
         return False
 
-    this_output_index = len(os.listdir(output_folder))
-    subfolder_name = f"video_{this_output_index}"
-    subfolder_path = os.path.join(output_folder, subfolder_name)
-    os.makedirs(subfolder_path, exist_ok=True)
+    subfolder_path = reserve_numbered_path(output_folder, "video_{}", is_dir=True)
 
     # move that vid to the subfolder
     new_video_path = os.path.join(subfolder_path, "video.mp4")
@@ -301,53 +278,47 @@ from caption_maker import (
 )
 
 
-def create_slop_with_captions_video():
-    all_posts = DataSaver().get_all_posts()
-    if len(all_posts) == 0:
-        print(f"[!] Fatal error: DataSaver().get_all_posts() yielded no post objects!")
-        return False
-
+def create_slop_with_captions_video(output_dir="final_vids"):
     # define criteria for post selection
     max_text_len = 2000
     min_text_len = 600
 
     # select a post that hasnt been used, and fits criteria
     post_history_module = PostUsageHistory()
-    while 1:
-        random_post = random.choice(all_posts)
-        post_data = random_post.to_dict()
-
-        # make sure post has valid text size
-        text_len = len(post_data["content"])
-        if text_len < min_text_len or text_len > max_text_len:
-            all_posts.remove(random_post)
-            continue
+    candidates = DataSaver().query_posts(
+        exclude_urls=post_history_module.get_all_posts(),
+        min_content_len=min_text_len,
+        max_content_len=max_text_len,
+    )
+    # the first one no other video worker has claimed in the meantime
+    random_post = next(
+        (post for post in candidates if post_history_module.claim(post.url)), None
+    )
+    if random_post is None:
+        print(f"[!] Fatal error: There are no unused posts that fit the criteria!")
+        return False
 
-        # make sure post is new
-        post_url = post_data["url"]
-        if post_history_module.post_exists(post_url):
-            all_posts.remove(random_post)
-            continue
+    post_data = random_post.to_dict()
 
-        # if we got here, we have a valid post
-        post_history_module.add_post(post_url)
-        break
+    with Workspace() as workspace:
+        return _create_slop_with_captions_video(post_data, output_dir, workspace)
 
-    
 
+def _create_slop_with_captions_video(post_data, output_dir, workspace):
     #narrate the post
     content_to_narrate = f"{post_data['title']}. {post_data['content']}"
     narration_file_path, narration_duration = narrate(
-        "jf_alpha", content_to_narrate)
+        "jf_alpha", content_to_narrate, output_folder=workspace.folder("narrations"))
     
     #extract a slop video as background
     print(f"Extracting a slop video for the post...")
     slop_extractor = Extractor()
-    slop_video_file_path = r"temp/slop_video.mp4"
+    slop_video_file_path = workspace.path("slop_video.mp4")
     slop_extractor.get_random_sludge_video(
         narration_duration,
         slop_video_file_path,
         VIDEO_DIMS,
+        workspace,
     )
 
     #transcribe the narration
@@ -359,28 +330,95 @@ def create_slop_with_captions_video():
     frames = generate_caption_frames(
         word_timestamps, max_group_duration=2.5, max_words=5
     )
-    captioned_video_path = "captioned_output.mp4"
-    caption_video(slop_video_file_path, frames, out_video_path=captioned_video_path)
+    captioned_video_path = workspace.path("captioned_output.mp4")
+    caption_video(
+        slop_video_file_path,
+        frames,
+        out_video_path=captioned_video_path,
+    )
     
     #add narration
-    narrated_captioned_video_path = "narrated_captioned_output.mp4"
-    add_audio_to_video(
-        captioned_video_path, narration_file_path, narrated_captioned_video_path
-    )
+    with reserved_output_path(output_dir, "{}.mp4") as narrated_captioned_video_path:
+        add_audio_to_video(
+            captioned_video_path,
+            narration_file_path,
+            narrated_captioned_video_path,
+            workspace,
+        )
     print(f'Created a narrated captioned video at {narrated_captioned_video_path}')
+    return narrated_captioned_video_path
+
+
+def init_video_worker(threads):
+    # every library would otherwise size its thread pool to the whole
+    # machine, and N jobs would fight over the same cores
+    import cv2
+    import torch
+
+    cv2.setNumThreads(threads)
+    torch.set_num_threads(threads)
+
+
+def make_video_job(output_dir, job_id):
+    """One finished video (and its metadata) in output_dir, or None."""
+    with Workspace(prefix=f"job_{job_id}_") as workspace:
+        result = create_stacked_reddit_scroll_video(output_dir, workspace)
+    if not result:
+        return None
+    narrated_video_path, narration_content = result
+    metadata_dict = create_metadata(narration_content)
+    compile_video_and_metadata(narrated_video_path, metadata_dict, output_dir)
+    return narrated_video_path
 
 
 # main entry point functions
-def create_all_stacked_reddit_scroll_videos(output_dir="final_vids"):
-    while 1:
-        try:
-            narrated_video_path, narration_content = create_stacked_reddit_scroll_video(
-                output_dir
-            )
-            metadata_dict = create_metadata(narration_content)
-            compile_video_and_metadata(narrated_video_path, metadata_dict, output_dir)
-        except:
-            pass
+def create_all_stacked_reddit_scroll_videos(
+    output_dir="final_vids", workers=None, max_videos=None
+):
+    """
+    Render videos back to back, workers at a time, until max_videos are
+    done (forever by default). Each job claims its own post, so no two
+    videos are ever made from the same one.
+    """
+    workers = workers or VIDEO_WORKERS
+    if workers <= 1:
+        made, job_id = 0, 0
+        while max_videos is None or made < max_videos:
+            try:
+                made += make_video_job(output_dir, job_id) is not None
+            except Exception as e:
+                print(f"[!] Video job failed: {e}")
+            job_id += 1
+        return made
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"Rendering {workers} videos at a time, {threads} threads each...")
+    made, job_id = 0, 0
+    in_flight = set()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        # torch and ffmpeg dont survive being forked mid-use
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_video_worker,
+        initargs=(threads,),
+        max_tasks_per_child=VIDEOS_PER_WORKER_PROCESS,
+    ) as pool:
+        while True:
+            while len(in_flight) < workers and (
+                max_videos is None or made + len(in_flight) < max_videos
+            ):
+                in_flight.add(pool.submit(make_video_job, output_dir, job_id))
+                job_id += 1
+            if not in_flight:
+                break
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    made += future.result() is not None
+                except Exception as e:
+                    print(f"[!] Video job failed: {e}")
+    return made
 
 
 if __name__ == "__main__":
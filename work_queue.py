@@ -0,0 +1,448 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from post_ids import canonical_post_url
+
+
+# a task whose worker has not finished or renewed it by then is handed out again
+LEASE_SECONDS = 600
+# tasks that failed this many times are parked as "failed" instead of retried
+MAX_ATTEMPTS = 3
+
+
+class WorkQueue:
+    """
+    Scrape tasks in one sqlite file that any number of worker processes,
+    on this machine or others sharing the file, claim with a lease.
+
+    Tasks are "listing" (scroll a subreddit, enqueue its new post links)
+    or "post" (fetch one post into the corpus). A worker that dies leaves
+    its leases to expire and the tasks go back to the next claimer.
+
+    sqlite locking needs a filesystem with working fcntl locks (local
+    disk, or NFSv4 / SMB with locking enabled); older NFS mounts can
+    corrupt the file under concurrent writers.
+    """
+
+    def __init__(self, db_path="scrape_queue.sqlite", lease_seconds=LEASE_SECONDS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.lock = threading.Lock()
+        # autocommit, so claim() can take the write lock with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(
+            db_path, timeout=60, check_same_thread=False, isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                target TEXT NOT NULL,
+                params TEXT,
+                state TEXT NOT NULL DEFAULT 'pending',
+                lease_owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                UNIQUE (kind, target)
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, kind)"
+        )
+
+    def put(self, kind, target, params=None, requeue_done=False):
+        """
+        Add a task. Returns False if it is already queued; a task that is
+        done is only run again with requeue_done (listings on a new crawl).
+        """
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO tasks (kind, target, params) VALUES (?, ?, ?)",
+                (kind, target, json.dumps(params or {})),
+            )
+            if cursor.rowcount == 0 and requeue_done:
+                cursor = self.conn.execute(
+                    """
+                    UPDATE tasks SET state = 'pending', params = ?, attempts = 0,
+                        error = NULL
+                    WHERE kind = ? AND target = ? AND state IN ('done', 'failed')
+                    """,
+                    (json.dumps(params or {}), kind, target),
+                )
+        return cursor.rowcount == 1
+
+    def put_many(self, kind, targets, params=None):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                added = 0
+                for target in targets:
+                    cursor = self.conn.execute(
+                        "INSERT OR IGNORE INTO tasks (kind, target, params) "
+                        "VALUES (?, ?, ?)",
+                        (kind, target, json.dumps(params or {})),
+                    )
+                    added += cursor.rowcount
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def claim(self, worker_id, kind=None, limit=1):
+        """
+        Lease up to limit runnable tasks to worker_id: pending ones, or
+        leased ones whose lease ran out. Post tasks go before listings so
+        the corpus grows while listings are still being read.
+        Returns a list of {"id", "kind", "target", "params"} dicts.
+        """
+        now = time.time()
+        where = (
+            "(state = 'pending' OR "
+            "(state = 'leased' AND lease_expires < ? AND attempts < ?))"
+        )
+        params = [now, MAX_ATTEMPTS]
+        if kind is not None:
+            where += " AND kind = ?"
+            params.append(kind)
+
+        with self.lock:
+            # take the write lock before reading so two workers cant
+            # both pick the same rows
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # a task whose lease ran out on its last attempt most likely
+                # crashed its worker every time; stop handing it out
+                self.conn.execute(
+                    """
+                    UPDATE tasks SET state = 'failed', lease_owner = NULL,
+                        error = 'lease expired on the last attempt'
+                    WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?
+                    """,
+                    (now, MAX_ATTEMPTS),
+                )
+                rows = self.conn.execute(
+                    f"""
+                    SELECT id, kind, target, params FROM tasks WHERE {where}
+                    ORDER BY kind = 'post' DESC, id LIMIT ?
+                    """,
+                    (*params, limit),
+                ).fetchall()
+                self.conn.executemany(
+                    """
+                    UPDATE tasks SET state = 'leased', lease_owner = ?,
+                        lease_expires = ?, attempts = attempts + 1
+                    WHERE id = ?
+                    """,
+                    [(worker_id, now + self.lease_seconds, row[0]) for row in rows],
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        return [
+            {"id": row[0], "kind": row[1], "target": row[2], "params": json.loads(row[3])}
+            for row in rows
+        ]
+
+    def _update_leased(self, task_id, worker_id, sql, params=()):
+        # only the current lease holder may touch a task; a worker whose
+        # lease expired and was taken over gets False back
+        with self.lock:
+            cursor = self.conn.execute(
+                f"{sql} WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                (*params, task_id, worker_id),
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, task_id, worker_id):
+        return self._update_leased(
+            task_id,
+            worker_id,
+            "UPDATE tasks SET lease_expires = ?",
+            (time.time() + self.lease_seconds,),
+        )
+
+    def complete(self, task_id, worker_id):
+        return self._update_leased(
+            task_id, worker_id, "UPDATE tasks SET state = 'done', lease_owner = NULL"
+        )
+
+    def fail(self, task_id, worker_id, error):
+        return self._update_leased(
+            task_id,
+            worker_id,
+            """
+            UPDATE tasks SET lease_owner = NULL, error = ?,
+                state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END
+            """,
+            (str(error), MAX_ATTEMPTS),
+        )
+
+    def counts(self):
+        """{(kind, state): number of tasks}"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT kind, state, COUNT(*) FROM tasks GROUP BY kind, state"
+            ).fetchall()
+        return {(kind, state): count for kind, state, count in rows}
+
+    def unfinished(self):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'leased')"
+            ).fetchone()
+        return row[0]
+
+    def close(self):
+        self.conn.close()
+
+
+def enqueue_threads(work_queue, threads_to_scrape, posts_to_scrape, incremental=False):
+    """Coordinator side: one listing task per subreddit."""
+    params = {"posts_to_scrape": posts_to_scrape, "incremental": incremental}
+    added = 0
+    for thread in dict.fromkeys(threads_to_scrape):
+        added += work_queue.put("listing", thread, params, requeue_done=True)
+    print(f"Queued {added} subreddit listings in {work_queue.db_path}")
+    return added
+
+
+def run_worker(
+    db_path="scrape_queue.sqlite",
+    worker_id=None,
+    data_backend="sqlite",
+    data_root=".",
+    tabs=1,
+    batch_size=8,
+    forever=False,
+    idle_sleep=10,
+    stop_flag=None,
+    **scraper_kwargs,
+):
+    """
+    Claim and run tasks until the queue is drained (or forever, polling
+    every idle_sleep seconds). Every worker saves into the same corpus;
+    the sqlite backend is the one that is safe to share between processes.
+    """
+    # imported here so the coordinator never needs selenium installed
+    from scraper import DataSaver, RedditScraper
+
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    work_queue = WorkQueue(db_path)
+    saver = DataSaver(backend=data_backend, root=data_root)
+    scraper = None
+    tasks_done = 0
+
+    try:
+        while stop_flag is None or not stop_flag.is_set():
+            tasks = work_queue.claim(worker_id, kind="post", limit=batch_size)
+            if not tasks:
+                tasks = work_queue.claim(worker_id, kind="listing")
+            if not tasks:
+                if not forever and work_queue.unfinished() == 0:
+                    break
+                # other workers still hold leases that may expire, or
+                # listings that will add posts
+                time.sleep(idle_sleep)
+                continue
+
+            if scraper is None:
+                scraper = RedditScraper(saver=saver, **scraper_kwargs)
+
+            if tasks[0]["kind"] == "listing":
+                run_listing_task(work_queue, worker_id, scraper, tasks[0])
+            else:
+                run_post_tasks(work_queue, worker_id, scraper, tasks, tabs)
+            tasks_done += len(tasks)
+    finally:
+        if scraper is not None:
+            scraper.driver.quit()
+        work_queue.close()
+
+    print(f"[{worker_id}] finished after {tasks_done} tasks")
+    return tasks_done
+
+
+class LeaseKeeper:
+    """
+    Renews a task's lease from a background thread while one long call
+    runs (a listing scroll can outlast LEASE_SECONDS).
+    """
+
+    def __init__(self, work_queue, task_id, worker_id):
+        self.work_queue = work_queue
+        self.task_id = task_id
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.work_queue.lease_seconds / 3):
+            if not self.work_queue.renew(self.task_id, self.worker_id):
+                print(f"[!] [{self.worker_id}] lost the lease on task {self.task_id}")
+                return
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def run_listing_task(work_queue, worker_id, scraper, task):
+    thread_link = task["target"]
+    params = task["params"]
+    try:
+        with LeaseKeeper(work_queue, task["id"], worker_id):
+            post_links = scraper.get_posts(
+                thread_link,
+                max_posts=params.get("posts_to_scrape", 50),
+                incremental=params.get("incremental", False),
+            )
+    except Exception as e:
+        print(f"[!] Listing {thread_link} failed: {e}")
+        work_queue.fail(task["id"], worker_id, e)
+        return
+
+    post_links = [canonical_post_url(link) for link in post_links]
+    added = work_queue.put_many("post", post_links, {"thread": thread_link})
+    work_queue.complete(task["id"], worker_id)
+    print(f"[{worker_id}] {thread_link}: queued {added} new posts")
+
+
+def run_post_tasks(work_queue, worker_id, scraper, tasks, tabs=1):
+    tasks_by_link = {task["target"]: task for task in tasks}
+
+    # another worker may have saved it since the task was queued
+    for link, task in list(tasks_by_link.items()):
+        if scraper.saver.data_exists(link):
+            work_queue.complete(task["id"], worker_id)
+            del tasks_by_link[link]
+
+    finished = set()
+    posts = scraper.iter_post_contents(list(tasks_by_link), tabs=tabs)
+    try:
+        for post in posts:
+            task = tasks_by_link.get(canonical_post_url(post.url))
+            scraper.saver.save_post_data(post)
+            if task is not None:
+                work_queue.complete(task["id"], worker_id)
+                finished.add(task["id"])
+                # the rest of the batch is still being worked on
+                for other in tasks_by_link.values():
+                    if other["id"] not in finished:
+                        work_queue.renew(other["id"], worker_id)
+    except Exception as e:
+        print(f"[!] Post batch failed: {e}")
+    finally:
+        posts.close()
+        for task in tasks_by_link.values():
+            if task["id"] not in finished:
+                work_queue.fail(task["id"], worker_id, "not scraped")
+
+
+def print_status(work_queue):
+    counts = work_queue.counts()
+    for kind in ("listing", "post"):
+        states = {
+            state: counts.get((kind, state), 0)
+            for state in ("pending", "leased", "done", "failed")
+        }
+        print(f"{kind}: " + " | ".join(f"{s} {n}" for s, n in states.items()))
+
+
+def run_local(db_path, threads_to_scrape, posts_to_scrape, workers, **worker_kwargs):
+    """Coordinator plus worker processes on this machine."""
+    work_queue = WorkQueue(db_path)
+    enqueue_threads(work_queue, threads_to_scrape, posts_to_scrape)
+    work_queue.close()
+
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            kwargs={"db_path": db_path, "worker_id": f"local-{i}", **worker_kwargs},
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    print_status(WorkQueue(db_path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed scraping work queue")
+    parser.add_argument("--queue", default="scrape_queue.sqlite")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = subparsers.add_parser(
+        "enqueue", help="queue a listing task per subreddit"
+    )
+    enqueue_parser.add_argument("threads", nargs="+")
+    enqueue_parser.add_argument("--posts", type=int, default=500)
+    enqueue_parser.add_argument("--incremental", action="store_true")
+
+    def add_worker_arguments(subparser):
+        subparser.add_argument("--backend", default="sqlite", choices=("folder", "sqlite"))
+        subparser.add_argument("--root", default=".")
+        subparser.add_argument("--tabs", type=int, default=1)
+        subparser.add_argument("--batch", type=int, default=8)
+        subparser.add_argument("--profile", default=None)
+
+    work_parser = subparsers.add_parser("work", help="claim and run tasks")
+    work_parser.add_argument("--worker-id", default=None)
+    work_parser.add_argument("--forever", action="store_true")
+    add_worker_arguments(work_parser)
+
+    local_parser = subparsers.add_parser(
+        "local", help="enqueue and run worker processes on this machine"
+    )
+    local_parser.add_argument("threads", nargs="+")
+    local_parser.add_argument("--posts", type=int, default=500)
+    local_parser.add_argument("--workers", type=int, default=4)
+    add_worker_arguments(local_parser)
+
+    subparsers.add_parser("status", help="task counts by kind and state")
+
+    args = parser.parse_args()
+    if args.command == "enqueue":
+        enqueue_threads(WorkQueue(args.queue), args.threads, args.posts, args.incremental)
+    elif args.command == "work":
+        run_worker(
+            args.queue,
+            args.worker_id,
+            args.backend,
+            args.root,
+            args.tabs,
+            args.batch,
+            args.forever,
+            profile=args.profile,
+        )
+    elif args.command == "local":
+        run_local(
+            args.queue,
+            args.threads,
+            args.posts,
+            args.workers,
+            data_backend=args.backend,
+            data_root=args.root,
+            tabs=args.tabs,
+            batch_size=args.batch,
+            profile=args.profile,
+        )
+    elif args.command == "status":
+        print_status(WorkQueue(args.queue))
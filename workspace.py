@@ -0,0 +1,104 @@
+import os
+import platform
+import shutil
+import stat
+import subprocess
+import tempfile
+
+
+# every video job gets its own folder under here
+WORKSPACE_ROOT = "video_jobs"
+# with USE_TMPFS the folders go to /dev/shm instead, so intermediate videos
+# never touch the disk; each job then holds a few hundred MB of RAM
+USE_TMPFS = False
+TMPFS_ROOT = "/dev/shm/reddit_sludge_jobs"
+
+
+def make_deletable(file):
+    try:
+        os.chmod(file, stat.S_IWUSR | stat.S_IRUSR)
+    except Exception:
+        pass
+
+
+def delete_file(file):
+    if platform.system() == "Windows":
+        try:
+            subprocess.run(
+                ["takeown", "/f", str(file)],
+                check=False,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            subprocess.run(
+                ["icacls", str(file), "/grant", "Everyone:F"],
+                check=False,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            subprocess.run(
+                ["del", "/f", "/q", str(file)],
+                shell=True,
+                check=False,
+            )
+        except Exception:
+            pass
+    else:
+        try:
+            os.unlink(file)
+        except PermissionError:
+            subprocess.run(["sudo", "rm", "-f", str(file)], check=False)
+
+
+class Workspace:
+    """
+    Scratch folder owned by one video job. Every intermediate file of the
+    job is named through path() or folder(), and cleanup() only ever
+    removes this folder, so any number of jobs can render side by side.
+    """
+
+    def __init__(self, root=None, tmpfs=None, prefix="job_"):
+        tmpfs = USE_TMPFS if tmpfs is None else tmpfs
+        if root is None:
+            if tmpfs and os.path.isdir(os.path.dirname(TMPFS_ROOT)):
+                root = TMPFS_ROOT
+            else:
+                root = WORKSPACE_ROOT
+        os.makedirs(root, exist_ok=True)
+        self.dir = tempfile.mkdtemp(prefix=prefix, dir=root)
+
+    def path(self, *parts):
+        """A file path inside the workspace (its parent folders are created)."""
+        file_path = os.path.join(self.dir, *parts)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        return file_path
+
+    def folder(self, *parts):
+        folder_path = os.path.join(self.dir, *parts)
+        os.makedirs(folder_path, exist_ok=True)
+        return folder_path
+
+    def temp_audio_path(self, out_video_path, extension="m4a"):
+        # moviepy muxes audio through a temp file named after the output and
+        # put in the current folder, where jobs writing the same name collide
+        name = os.path.splitext(os.path.basename(out_video_path))[0]
+        return self.path("moviepy", f"{name}_TEMP_MPY_wvf_snd.{extension}")
+
+    def cleanup(self):
+        if not os.path.exists(self.dir):
+            return
+        for folder_path, _, file_names in os.walk(self.dir):
+            for file_name in file_names:
+                file_path = os.path.join(folder_path, file_name)
+                try:
+                    make_deletable(file_path)
+                    delete_file(file_path)
+                except Exception as e:
+                    print(f"[!] Failed to delete {file_path}: {e}")
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cleanup()